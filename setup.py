@@ -45,6 +45,7 @@ setup(
             "isort",
             "matplotlib",
         ],
+        "fast": ["numba"],
     },
     scripts=[],
     project_urls={
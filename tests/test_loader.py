@@ -0,0 +1,412 @@
+import os
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+import numpy as np
+import pytest
+
+import zhaires._kernels as _kernels
+import zhaires.loader as loader
+
+# a (heavily trimmed) ZHAireS summary file
+SUMMARY = """
+         Primary particle: Proton
+         Primary energy: 1.2500 EeV
+         Primary zenith angle:     53.44 deg
+         Primary azimuth angle:    -12.50 deg
+         Site: SouthPole  (Lat:  -90.00 deg. Long:    0.00 deg)
+         Ground altitude:    2.90 km
+         Injection altitude:  100.00 km
+         Geomagnetic field: Intensity: 55.1200 uT
+                            I: -72.40 deg. D: -30.40 deg
+         Thinning energy: 1.00E-04 Relative
+         Sl. depth of max. (g/cm2):   750.25
+
+ Antenna|   X [m]   |   Y [m]   |   Z [m]   |  t0 [ns]
+ -------|-----------|-----------|-----------|----------
+{antennas}
+         Time bin size:   0.50ns
+         Refraction index at sea level:1.000325
+"""
+
+
+def make_simulation(directory: str, sim: str, lengths: list) -> np.ndarray:
+    """
+    Write a fake ZHAireS simulation with `len(lengths)` antennas
+    where each antenna has `lengths[i]` samples.
+
+    Returns the raw (rows, columns) table written to timefresnel-root.dat.
+    """
+    os.makedirs(os.path.join(directory, sim))
+
+    # a random number generator so that every test is reproducible
+    rng = np.random.RandomState(0)
+
+    rows, antennas = [], []
+    for iant, length in enumerate(lengths):
+        x, y, z, t0 = 100.0 * iant, -50.0 * iant, 2900.0, 120.0 + iant
+        antennas.append(f"{iant + 1:8d} {x:10.2f} {y:10.2f} {z:10.2f} {t0:10.2f}")
+
+        # and the fake electric field at each time
+        table = rng.normal(size=(length, 16))
+        table[:, 0] = 1
+        table[:, 1] = iant + 1
+        table[:, 2:5] = x, y, z
+        table[:, 5] = t0 + 0.5 * np.arange(length)
+        rows.append(table)
+
+    raw = np.concatenate(rows)
+
+    # write the waveforms and the summary
+    np.savetxt(
+        os.path.join(directory, sim, "timefresnel-root.dat"),
+        raw,
+        fmt="%.6E",
+        header="ZHAireS time-domain antenna fields",
+    )
+    with open(os.path.join(directory, sim, f"{sim}.sry"), "w") as f:
+        f.write(SUMMARY.format(antennas="\n".join(antennas)))
+
+    return np.loadtxt(os.path.join(directory, sim, "timefresnel-root.dat"))
+
+
+def test_load_properties(tmpdir: str) -> None:
+    """
+    Check that I can parse the properties from a summary file.
+    """
+    make_simulation(str(tmpdir), "props", [10, 10])
+
+    props = loader.load_properties("props", str(tmpdir))
+
+    assert props["particle"] == "proton"
+    assert np.isclose(props["energy"], 1.25)
+    assert props["zenith"] == 53.44
+    assert props["azimuth"] == -12.5
+    assert (props["lat"], props["lon"]) == (-90.0, 0.0)
+    assert (props["ground"], props["injection"]) == (2.9, 100.0)
+    assert (props["mag_str"], props["mag_inc"], props["mag_dec"]) == (
+        55.12,
+        -72.4,
+        -30.4,
+    )
+    assert props["thinning"] == 1e-4
+    assert props["xmax"] == 750.25
+    assert props["dt"] == 0.5
+    assert props["rindex"] == 1.000325
+    assert props["antenna_positions"].shape == (2, 5)
+
+
+def test_load_properties_single_line(tmpdir: str) -> None:
+    """
+    Check that a property is only matched within a single line.
+    """
+    make_simulation(str(tmpdir), "lines", [10])
+
+    # a label whose value is on the next line
+    filename = os.path.join(str(tmpdir), "lines", "lines.sry")
+    with open(filename, "a") as f:
+        f.write("         Primary zenith angle:\n     12.50 deg\n")
+
+    assert loader.load_properties("lines", str(tmpdir))["zenith"] == 53.44
+
+
+def test_load_properties_cache(tmpdir: str) -> None:
+    """
+    Check that properties are cached until the summary file changes.
+    """
+    make_simulation(str(tmpdir), "cached", [10])
+
+    first = loader.load_properties("cached", str(tmpdir))
+    hits = loader._parse_summary.cache_info().hits
+
+    # the second load is a (separate) copy of the cached properties
+    second = loader.load_properties("cached", str(tmpdir))
+    assert loader._parse_summary.cache_info().hits == hits + 1
+    assert second is not first and second["zenith"] == first["zenith"]
+
+    # rewrite the summary with a different zenith angle
+    filename = os.path.join(str(tmpdir), "cached", "cached.sry")
+    with open(filename) as f:
+        summary = f.read().replace("53.44", "60.00")
+    with open(filename, "w") as f:
+        f.write(summary)
+    os.utime(filename, ns=(0, 0))
+
+    assert loader.load_properties("cached", str(tmpdir))["zenith"] == 60.0
+
+
+def test_load_waveforms(tmpdir: str) -> None:
+    """
+    Check that I can load the waveforms of each antenna.
+    """
+    raw = make_simulation(str(tmpdir), "waveforms", [20, 20, 20])
+
+    data = loader.load_waveforms("waveforms", str(tmpdir), write_cache=False)
+
+    assert data.E.shape == (3, 3, 20)
+    assert data.Ex.shape == (3, 20)
+    assert data.positions.shape == (3, 3)
+    for iant in range(3):
+        rows = raw[raw[:, 1] == iant + 1]
+        assert np.allclose(data.x[iant], rows[0, 2])
+        assert np.allclose(data.t[iant], rows[:, 5])
+        assert np.allclose(data.Ex[iant], rows[:, 11])
+        assert np.allclose(data.Ey[iant], rows[:, 12])
+        assert np.allclose(data.Ez[iant], rows[:, 13])
+    assert np.isclose(data.properties["energy"], 1.25)
+
+
+def test_load_waveforms_in_parallel(tmpdir: str, monkeypatch: Any) -> None:
+    """
+    Check that copying blocks of antennas in parallel gives the same waveforms.
+    """
+    make_simulation(str(tmpdir), "parallel", [20] * 10)
+
+    serial = loader.load_waveforms("parallel", str(tmpdir), write_cache=False)
+
+    # copy even the smallest simulation with several threads
+    monkeypatch.setattr(loader, "_PARALLEL_COPY_BYTES", 0)
+    monkeypatch.setattr(loader, "_COPY_THREADS", 4)
+    parallel = loader.load_waveforms("parallel", str(tmpdir), write_cache=False)
+
+    for field in ("t", "E", "positions"):
+        assert np.array_equal(getattr(parallel, field), getattr(serial, field))
+
+    # and the worker processes of `load_many` only use a single thread
+    loader._init_worker()
+    assert loader._COPY_THREADS == 1
+
+
+def test_pickle_waveforms(tmpdir: str) -> None:
+    """
+    Check that loaded waveforms can be pickled (i.e. sent to other processes).
+    """
+    make_simulation(str(tmpdir), "pickled", [20, 20])
+
+    data = loader.load_waveforms("pickled", str(tmpdir), write_cache=False)
+    copy = pickle.loads(pickle.dumps(data))
+
+    assert np.array_equal(copy.E, data.E)
+    assert copy.properties["zenith"] == data.properties["zenith"]
+
+
+def test_waveforms_cache(tmpdir: str) -> None:
+    """
+    Check that the cached waveforms match the parsed waveforms.
+    """
+    make_simulation(str(tmpdir), "cache", [20, 20])
+
+    parsed = loader.load_waveforms("cache", str(tmpdir))
+    cached = loader.load_waveforms("cache", str(tmpdir))
+
+    for field in ("t", "E", "positions"):
+        assert isinstance(getattr(cached, field), np.memmap)
+        assert np.array_equal(getattr(parsed, field), getattr(cached, field))
+
+
+def test_concurrent_waveforms_cache(tmpdir: str) -> None:
+    """
+    Check that several writers can cache the same simulation at once.
+    """
+    make_simulation(str(tmpdir), "race", [20, 20])
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        futures = [
+            executor.submit(loader.load_waveforms, "race", str(tmpdir))
+            for _ in range(16)
+        ]
+        parsed = [future.result() for future in futures]
+
+    # no temporary files are left behind
+    assert sorted(os.listdir(os.path.join(str(tmpdir), "race", "waveforms"))) == [
+        "E.npy",
+        "positions.npy",
+        "t.npy",
+    ]
+
+    cached = loader.load_waveforms("race", str(tmpdir))
+    for field in ("t", "E", "positions"):
+        assert np.array_equal(getattr(parsed[0], field), getattr(cached, field))
+
+
+def test_load_many(tmpdir: str) -> None:
+    """
+    Check that I can load several simulations in parallel.
+    """
+    make_simulation(str(tmpdir), "first", [20, 20])
+    make_simulation(str(tmpdir), "second", [10, 10, 10])
+
+    # cache one of the simulations beforehand
+    parsed = loader.load_waveforms("second", str(tmpdir))
+
+    first, second = loader.load_many(["first", "second"], str(tmpdir), n_workers=2)
+
+    assert first.Ex.shape == (2, 20)
+    assert isinstance(first.Ex, np.memmap)
+    for field in ("t", "E", "positions"):
+        assert np.array_equal(getattr(parsed, field), getattr(second, field))
+
+
+def test_read_table_usecols(tmpdir: str, monkeypatch: Any) -> None:
+    """
+    Check that the columns are returned in the order of `usecols`.
+    """
+    filename = os.path.join(str(tmpdir), "table.dat")
+    with open(filename, "w") as f:
+        f.write("# a comment\n1 2 3 4\n5 6 7 8\n")
+
+    expected = np.array([[4.0, 1.0, 3.0], [8.0, 5.0, 7.0]])
+
+    monkeypatch.setattr(loader, "pd", None)
+    table = loader._read_table(filename, usecols=(3, 0, 2))
+    assert np.array_equal(table, expected)
+
+    monkeypatch.setattr(loader, "pd", pytest.importorskip("pandas"))
+    table = loader._read_table(filename, usecols=(3, 0, 2))
+    assert np.array_equal(table, expected)
+
+
+def test_has_cache(tmpdir: str) -> None:
+    """
+    Check that both kinds of cache are found (without loading them).
+    """
+    make_simulation(str(tmpdir), "npy", [20, 20])
+    make_simulation(str(tmpdir), "npz", [20, 20])
+    make_simulation(str(tmpdir), "old", [20, 20])
+
+    for sim in ("npy", "npz", "old"):
+        assert not loader._has_cache(os.path.join(str(tmpdir), sim))
+
+    loader.load_waveforms("npy", str(tmpdir))
+    loader.load_waveforms("npz", str(tmpdir), compress=True)
+
+    # a compressed cache (written by an older version) without every field
+    np.savez_compressed(os.path.join(str(tmpdir), "old", "waveforms.npz"), t=[0.0])
+
+    assert loader._has_cache(os.path.join(str(tmpdir), "npy"))
+    assert loader._has_cache(os.path.join(str(tmpdir), "npz"))
+    assert not loader._has_cache(os.path.join(str(tmpdir), "old"))
+
+
+def test_load_many_repeated(tmpdir: str, monkeypatch: Any) -> None:
+    """
+    Check that a repeated simulation is only parsed once.
+    """
+    make_simulation(str(tmpdir), "repeated", [20, 20])
+
+    # record the simulations that are parsed (in threads so we can see them)
+    submitted = []
+    cache_waveforms = loader._cache_waveforms
+
+    def record(sim: str, directory: str) -> None:
+        submitted.append(sim)
+        cache_waveforms(sim, directory)
+
+    # (the worker initializer then runs in this process)
+    monkeypatch.setattr(loader, "ProcessPoolExecutor", ThreadPoolExecutor)
+    monkeypatch.setattr(loader, "_COPY_THREADS", None)
+    monkeypatch.setattr(loader, "_cache_waveforms", record)
+
+    waveforms = loader.load_many(["repeated"] * 4, str(tmpdir), n_workers=4)
+
+    assert submitted == ["repeated"]
+    assert len(waveforms) == 4
+    for field in ("t", "E", "positions"):
+        assert np.array_equal(
+            getattr(waveforms[0], field), getattr(waveforms[3], field)
+        )
+
+
+def test_compressed_waveforms_cache(tmpdir: str) -> None:
+    """
+    Check that the compressed cache matches the parsed waveforms.
+    """
+    make_simulation(str(tmpdir), "compressed", [20, 20])
+
+    parsed = loader.load_waveforms("compressed", str(tmpdir), compress=True)
+    assert os.path.exists(os.path.join(str(tmpdir), "compressed", "waveforms.npz"))
+
+    cached = loader.load_waveforms("compressed", str(tmpdir))
+    for field in ("t", "E", "positions"):
+        assert np.array_equal(getattr(parsed, field), getattr(cached, field))
+
+
+def test_waveforms_to_records(tmpdir: str) -> None:
+    """
+    Check that I can convert the waveforms to a structured array.
+    """
+    make_simulation(str(tmpdir), "records", [20, 20])
+
+    data = loader.load_waveforms("records", str(tmpdir), write_cache=False)
+    records = data.to_records()
+
+    assert records.shape == (2,)
+    assert np.array_equal(records["Ey"], data.Ey)
+    assert np.allclose(records["zenith"], 53.44)
+
+
+def test_load_ragged_waveforms(tmpdir: str) -> None:
+    """
+    Check that antennas with different numbers of samples are padded/cut.
+    """
+    raw = make_simulation(str(tmpdir), "ragged", [20, 18, 21])
+
+    data = loader.load_waveforms("ragged", str(tmpdir), write_cache=False)
+
+    # the waveforms are all the mean length
+    assert data.Ex.shape == (3, 20)
+
+    # the short antenna is zero-padded and the long one is cut
+    assert np.allclose(data.Ex[1, :18], raw[raw[:, 1] == 2, 11])
+    assert np.all(data.Ex[1, 18:] == 0)
+    assert np.allclose(data.Ex[2], raw[raw[:, 1] == 3, 11][:20])
+
+
+def test_fill_waveforms_kernels() -> None:
+    """
+    Check that the (optionally) compiled kernel matches the NumPy kernel.
+    """
+    raw = np.random.RandomState(0).normal(size=(16, 60))
+    columns = np.array([5, 11, 12, 13])
+    starts, nsamples = np.array([0, 20, 38]), np.array([20, 18, 20])
+
+    expected = np.zeros((3, 4, 20))
+    _kernels._fill_waveforms(raw, columns, starts, nsamples, expected)
+
+    out = np.zeros((3, 4, 20))
+    _kernels.fill_waveforms(raw, columns, starts, nsamples, out)
+
+    assert np.array_equal(out, expected)
+    assert np.array_equal(expected[1, 1, :18], raw[11, 20:38])
+    assert np.all(expected[1, :, 18:] == 0)
+
+
+def test_find_peaks_kernels() -> None:
+    """
+    Check that the (optionally) compiled kernel matches the NumPy kernel.
+    """
+    waveforms = np.random.RandomState(0).normal(size=(5, 3, 40))
+    waveforms[2, 1, 17] = -100.0
+
+    ipeak = _kernels.find_peaks(waveforms)
+
+    assert np.array_equal(ipeak, _kernels._find_peaks(waveforms))
+    assert ipeak[2] == 17
+
+
+def test_load_waveforms_with_pandas(tmpdir: str, monkeypatch: Any) -> None:
+    """
+    Check that the pandas parser (used with old numpy) gives the same waveforms.
+    """
+    pandas = pytest.importorskip("pandas")
+    make_simulation(str(tmpdir), "pandas", [20, 20])
+
+    monkeypatch.setattr(loader, "pd", None)
+    expected = loader.load_waveforms("pandas", str(tmpdir), write_cache=False)
+
+    monkeypatch.setattr(loader, "pd", pandas)
+    parsed = loader.load_waveforms("pandas", str(tmpdir), write_cache=False)
+
+    for field in ("t", "Ex", "Ey", "Ez"):
+        assert np.array_equal(getattr(parsed, field), getattr(expected, field))
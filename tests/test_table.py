@@ -0,0 +1,44 @@
+import os
+
+import pytest
+
+from zhaires.table import parse_table_type
+
+
+def write_header(directory: str, header: str) -> str:
+    """
+    Write a fake Aires table with a given header and return its filename.
+    """
+    filename = os.path.join(directory, "table.t0000")
+    with open(filename, "w") as f:
+        f.write(f"# {header}\n#\n   1   1.0000E+00   2.0000E+00\n")
+    return filename
+
+
+def test_parse_table_type(tmpdir: str) -> None:
+    """
+    Check that the highest priority phrase in a header decides its type.
+    """
+    headers = {
+        "TABLE 5: Energy distribution at ground": "ground",
+        "Longitudinal development: Energy deposit": "energy",
+        "Longitudinal development: Number of charged particles": "long",
+        "Lateral distribution: Energy distribution of gammas": "lateral",
+        "Unweighted lateral distribution: muons": "lateral",
+        "Energy distribution at ground, electrons": "energy",
+    }
+
+    for header, table_type in headers.items():
+        assert parse_table_type(write_header(str(tmpdir), header)) == table_type
+
+
+def test_parse_unknown_table_type(tmpdir: str) -> None:
+    """
+    Check that only the start of the header is used to find the type.
+    """
+    with pytest.raises(ValueError):
+        parse_table_type(write_header(str(tmpdir), "Some other table"))
+
+    # the identifying phrase has to be in the first 600 characters
+    with pytest.raises(ValueError):
+        parse_table_type(write_header(str(tmpdir), " " * 600 + "TABLE 5"))
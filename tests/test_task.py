@@ -1,4 +1,9 @@
 import os
+from typing import Any, List, Tuple
+
+import numpy as np
+import pytest
+
 import zhaires
 
 
@@ -31,3 +36,245 @@ def test_run_task() -> None:
 
     # and run the simulation
     sim.run()
+
+
+def make_program(directory: str, name: str) -> Tuple[str, str]:
+    """
+    Create a fake Aires binary that saves every command it receives.
+
+    Returns the path to the program and the file that it writes to.
+    """
+    program = os.path.join(directory, f"{name}.sh")
+    output = os.path.join(directory, f"{name}.inp")
+
+    # the program just copies its stdin into `output`
+    with open(program, "w") as f:
+        f.write(f'#!/bin/sh\nOUT="{output}"\ncat > "$OUT"\n')
+    os.chmod(program, 0o755)
+
+    return program, output
+
+
+def read_commands(output: str) -> List[str]:
+    """
+    Read the commands that were received by a fake Aires binary.
+    """
+    with open(output, "r") as f:
+        return f.read().splitlines()
+
+
+def test_buffered_task(tmpdir: str) -> None:
+    """
+    Check that commands are only sent to Aires at the end of a `with` block.
+    """
+    program, output = make_program(str(tmpdir), "buffered")
+
+    with zhaires.Task(program, directory=str(tmpdir)) as sim:
+        sim.task_name("buffered")
+        sim.primary_energy(1, "EeV")
+
+        # nothing has been sent to Aires yet
+        assert sim._buffer == b"TaskName buffered\nPrimaryEnergy 1 EeV\n"
+
+    # the buffer was written when the block exited
+    assert not sim._buffer
+
+    # and unbuffered commands are written immediately
+    sim.primary_particle("proton")
+    assert not sim._buffer
+
+    sim.run()
+
+    assert read_commands(output) == [
+        f"FileDirectory All {tmpdir}",
+        "Remark Task generated using zhaires.py",
+        "TaskName buffered",
+        "PrimaryEnergy 1 EeV",
+        "PrimaryParticle proton",
+    ]
+
+
+def test_flush_task(tmpdir: str) -> None:
+    """
+    Check that `flush` sends buffered commands without leaving the block.
+    """
+    program, output = make_program(str(tmpdir), "flush")
+
+    with zhaires.Task(program, directory=str(tmpdir)) as sim:
+        sim.task_name("flush")
+        sim.flush()
+        assert not sim._buffer
+
+        sim.remark("after flush")
+        assert sim._buffer == b"Remark after flush\n"
+
+    sim.run()
+
+    assert read_commands(output)[-2:] == ["TaskName flush", "Remark after flush"]
+
+
+def test_discard_buffered_task(tmpdir: str) -> None:
+    """
+    Check that a partial task is never sent to Aires if the block raises.
+    """
+    program, output = make_program(str(tmpdir), "discard")
+
+    with pytest.raises(RuntimeError):
+        with zhaires.Task(program, directory=str(tmpdir)) as sim:
+            process = sim.process
+            sim.task_name("discard")
+            raise RuntimeError("failed to configure the task")
+
+    # the buffered commands were dropped and Aires was closed
+    assert not sim._buffer
+    assert sim.process is None
+
+    # so no further commands can be sent
+    with pytest.raises(ValueError):
+        sim.task_name("discard")
+
+    # Aires may have been stopped before it even opened its output
+    process.wait()  # type: ignore
+    if os.path.exists(output):
+        assert "TaskName discard" not in read_commands(output)
+
+
+def test_add_antennas(tmpdir: str) -> None:
+    """
+    Check that `add_antennas` matches calling `add_antenna` in a loop.
+    """
+    program, output = make_program(str(tmpdir), "antennas")
+    points = np.array([[1.5, 2.0, 3.0], [0.1, -4.0, 1e6], [1 / 3, 0.0, -0.0]])
+
+    with zhaires.Task(program, directory=str(tmpdir)) as sim:
+        sim.add_antennas(points)
+        for point in points:
+            sim.add_antenna(*point)
+
+        # an empty list of antennas is a no-op
+        sim.add_antennas(np.zeros((0, 3)))
+
+    sim.run()
+
+    commands = read_commands(output)[2:]
+    assert commands[:3] == commands[3:]
+
+    # positions are written with enough digits to round-trip
+    assert commands[:3] == [
+        "AddAntenna 1.5 2 3",
+        "AddAntenna 0.10000000000000001 -4 1000000",
+        "AddAntenna 0.33333333333333331 0 -0",
+    ]
+    for command, point in zip(commands, points):
+        assert np.array_equal([float(v) for v in command.split()[1:]], point)
+
+
+def test_add_antennas_shape(tmpdir: str) -> None:
+    """
+    Check that `add_antennas` only accepts (N, 3) arrays.
+    """
+    program, output = make_program(str(tmpdir), "shape")
+
+    sim = zhaires.Task(program, directory=str(tmpdir))
+    for points in (np.zeros(3), np.zeros((4, 2)), np.zeros((2, 3, 1))):
+        with pytest.raises(ValueError):
+            sim.add_antennas(points)
+
+    sim.run()
+
+    assert len(read_commands(output)) == 2
+
+
+def test_load_from_file(tmpdir: str) -> None:
+    """
+    Check that command files are copied to Aires with a final newline.
+    """
+    program, output = make_program(str(tmpdir), "load")
+
+    # a command file without a final newline
+    cmdfile = os.path.join(str(tmpdir), "commands.inp")
+    with open(cmdfile, "w") as f:
+        f.write("TaskName load\nPrimaryParticle proton")
+
+    sim = zhaires.Task(program, cmdfile=cmdfile, directory=str(tmpdir))
+
+    # load it again while buffering
+    with sim:
+        sim.load_from_file(cmdfile)
+        sim.remark("buffered")
+
+    # and once more (with sendfile) after an unbuffered command
+    sim.remark("unbuffered")
+    sim.load_from_file(cmdfile)
+    sim.remark("done")
+
+    sim.run()
+
+    assert read_commands(output) == [
+        "TaskName load",
+        "PrimaryParticle proton",
+        f"FileDirectory All {tmpdir}",
+        "Remark Task generated using zhaires.py",
+        "TaskName load",
+        "PrimaryParticle proton",
+        "Remark buffered",
+        "Remark unbuffered",
+        "TaskName load",
+        "PrimaryParticle proton",
+        "Remark done",
+    ]
+
+
+def test_start_and_wait(tmpdir: str) -> None:
+    """
+    Check that a started task runs in the background until it is waited on.
+    """
+    program, output = make_program(str(tmpdir), "start")
+
+    with zhaires.Task(program, directory=str(tmpdir)) as sim:
+        sim.task_name("start")
+
+    # starting the task sends the buffered commands and closes the input
+    sim.start()
+    assert sim.process.stdin.closed  # type: ignore
+
+    assert sim.wait() == 0
+    assert read_commands(output)[-1] == "TaskName start"
+
+
+def test_run_many(tmpdir: str) -> None:
+    """
+    Check that `run_many` runs every task and yields each of them once.
+    """
+    tasks, outputs = [], []
+    for i in range(5):
+        program, output = make_program(str(tmpdir), f"many{i}")
+        with zhaires.Task(program, directory=str(tmpdir)) as sim:
+            sim.task_name(f"many{i}")
+        tasks.append(sim)
+        outputs.append(output)
+
+    completed = list(zhaires.Task.run_many(tasks, max_parallel=2))
+
+    assert len(completed) == len(tasks)
+    assert set(map(id, completed)) == set(map(id, tasks))
+
+    # every task received all of its commands
+    for i, (sim, output) in enumerate(zip(tasks, outputs)):
+        assert sim.process.returncode == 0  # type: ignore
+        assert read_commands(output)[-1] == f"TaskName many{i}"
+
+
+def test_task_run_directory(tmpdir: str, monkeypatch: Any) -> None:
+    """
+    Check that the default directory is the run directory when the task is created.
+    """
+    program, output = make_program(str(tmpdir), "rundir")
+
+    monkeypatch.setenv("AIRES_RUN_DIR", os.path.join(str(tmpdir), "runs"))
+
+    sim = zhaires.Task(program)
+    sim.run()
+
+    assert sim.directory == os.path.join(str(tmpdir), "runs")
+    assert read_commands(output)[0] == f"FileDirectory All {sim.directory}"
@@ -0,0 +1,256 @@
+import os
+from typing import Any
+
+import numpy as np
+import pytest
+import xarray as xr
+from test_loader import make_simulation
+
+import zhaires._kernels as _kernels
+import zhaires.loader as loader
+import zhaires.xarray as zxr
+
+
+def make_dataset(nant: int = 4, length: int = 100, dt: float = 0.5) -> xr.Dataset:
+    """
+    Create a fake ZHAireS dataset with a single spike in each antenna.
+    """
+    rng = np.random.RandomState(0)
+
+    # small noise with a large spike that moves between antennas
+    data = rng.normal(scale=0.01, size=(nant, 3, length)).astype(np.float32)
+    for iant in range(nant):
+        data[iant, iant % 3, 10 + 25 * iant] = -1.0
+
+    waveforms = xr.DataArray(
+        data,
+        dims=["nant", "pol", "time"],
+        coords={"pol": ["Ex", "Ey", "Ez"], "time": np.arange(length) * dt},
+        attrs={"units": "V/m", "dt": dt},
+    )
+    locations = xr.DataArray(
+        np.zeros((nant, 4), dtype=np.float32),
+        dims=["nant", "axis"],
+        coords={"axis": ["x", "y", "z", "t0"]},
+    )
+
+    return xr.Dataset({"waveforms": waveforms, "locations": locations})
+
+
+def test_trim_dataset() -> None:
+    """
+    Check that each antenna is trimmed around its own peak.
+    """
+    sim = make_dataset()
+
+    # 5 ns (10 samples) before and 10 ns (20 samples) after the peak
+    trimmed = zxr.trim_dataset(sim, (5.0, 10.0))
+
+    assert trimmed.waveforms.shape == (4, 3, 30)
+    assert trimmed.time.size == 30
+    for iant in range(4):
+        ipeak = 10 + 25 * iant
+        start = ipeak - 10
+
+        # the peak is always at the same place in the window
+        assert trimmed.waveforms.values[iant, iant % 3, 10] == -1.0
+
+        # the window either matches the original or is zero-padded
+        stop = min(start + 30, 100)
+        window = trimmed.waveforms.values[iant, :, : stop - start]
+        assert np.array_equal(window, sim.waveforms.values[iant, :, start:stop])
+        assert np.all(trimmed.waveforms.values[iant, :, stop - start :] == 0)
+
+        # and the start time is moved to the start of the window
+        assert np.isclose(trimmed.locations.sel(axis="t0").values[iant], 0.5 * start)
+
+
+def test_trim_transposed_dataset() -> None:
+    """
+    Check that the dimension order of the waveforms doesn't matter.
+    """
+    sim = make_dataset()
+
+    trimmed = zxr.trim_dataset(sim, (5.0, 10.0))
+    transposed = zxr.trim_dataset(
+        sim.transpose("time", "pol", "nant", ...), (5.0, 10.0)
+    )
+
+    assert np.array_equal(trimmed.waveforms.values, transposed.waveforms.values)
+
+
+def test_trim_waveforms_kernels() -> None:
+    """
+    Check that the (optionally) compiled kernel matches the NumPy kernel.
+    """
+    waveforms = np.random.RandomState(0).normal(size=(3, 3, 40))
+    starts = np.array([-5, 10, 30])
+
+    expected = np.empty((3, 3, 20))
+    _kernels._trim_waveforms(waveforms, starts, expected)
+
+    out = np.empty((3, 3, 20))
+    _kernels.trim_waveforms(waveforms, starts, out)
+
+    assert np.array_equal(out, expected)
+    assert np.all(expected[0, :, :5] == 0)
+    assert np.array_equal(expected[0, :, 5:], waveforms[0, :, :15])
+    assert np.array_equal(expected[2, :, :10], waveforms[2, :, 30:])
+    assert np.all(expected[2, :, 10:] == 0)
+
+
+def test_resample_dataset() -> None:
+    """
+    Check that resampling keeps the time range and matches a smooth signal.
+    """
+    sim = make_dataset(length=200, dt=0.5)
+
+    # replace the waveforms with a slow sine wave
+    signal = np.sin(2 * np.pi * 0.05 * sim.time.values).astype(np.float32)
+    sim.waveforms.values[...] = signal
+
+    for method in ("cubic", "linear"):
+        resampled = zxr.resample_waveforms(sim, 5.0, method=method)
+
+        # 99.5 ns is covered by 497 (and a half) periods of 0.2 ns
+        assert resampled.time.size == 498
+        assert np.isclose(resampled.time.values[-1], 99.4)
+        assert np.isclose(resampled.waveforms.attrs["dt"], 0.2)
+
+        # away from the edges (where the spline is clamped)
+        expected = np.sin(2 * np.pi * 0.05 * resampled.time.values)
+        assert np.allclose(
+            resampled.waveforms.values[2, 1, 5:-5], expected[5:-5], atol=1e-2
+        )
+
+
+def test_resample_cubic_kernels() -> None:
+    """
+    Check that the (optionally) compiled kernel matches the NumPy kernel.
+    """
+    waveforms = np.random.RandomState(0).normal(size=(3, 3, 40))
+
+    expected = np.empty((3, 3, 97))
+    _kernels._resample_cubic(waveforms, 0.4, expected)
+
+    out = np.empty((3, 3, 97))
+    _kernels.resample_cubic(waveforms, 0.4, out)
+
+    assert np.allclose(out, expected)
+
+    # the spline passes through the original samples
+    assert np.allclose(expected[..., ::5], waveforms[..., ::2])
+
+
+def test_resample_integer_ratio() -> None:
+    """
+    Check that integer up and downsampling matches a smooth signal.
+    """
+    sim = make_dataset(length=200, dt=0.5)
+
+    # replace the waveforms with a slow sine wave
+    signal = np.sin(2 * np.pi * 0.05 * sim.time.values).astype(np.float32)
+    sim.waveforms.values[...] = signal
+
+    # upsample by 2 and downsample by 2
+    for fs, N in ((4.0, 399), (1.0, 100)):
+        resampled = zxr.resample_waveforms(sim, fs)
+
+        assert resampled.time.size == N
+        assert resampled.waveforms.dtype == np.float32
+        assert np.isclose(resampled.waveforms.attrs["dt"], 1.0 / fs)
+
+        # away from the edges (where the filter is truncated)
+        expected = np.sin(2 * np.pi * 0.05 * resampled.time.values)
+        assert np.allclose(
+            resampled.waveforms.values[2, 1, 20:-20], expected[20:-20], atol=1e-2
+        )
+
+
+def test_load_waveforms_from_loader_cache(tmpdir: str) -> None:
+    """
+    Check that the dataset is writeable even if the loader's cache is read-only.
+    """
+    make_simulation(str(tmpdir), "mmapped", [20, 20])
+
+    # write the (memory-mapped) .npy cache of the loader
+    loader.load_waveforms("mmapped", str(tmpdir))
+
+    dataset = zxr.load_waveforms("mmapped", str(tmpdir), write_netcdf=False)
+    dataset.waveforms[0, 0, 0] = 1.0
+
+    assert dataset.waveforms.values[0, 0, 0] == 1.0
+
+
+def test_load_waveforms_netcdf_cache(tmpdir: str) -> None:
+    """
+    Check that the NetCDF cache is written in the background and then used.
+    """
+    make_simulation(str(tmpdir), "netcdf", [20, 20])
+
+    created = zxr.load_waveforms("netcdf", str(tmpdir))
+
+    # the returned dataset can be modified while the cache is written
+    expected = created.copy(deep=True)
+    created.waveforms[...] = 0.0
+
+    zxr._wait_for_writes()
+    assert os.path.exists(os.path.join(str(tmpdir), "netcdf", "netcdf.raw.nc"))
+
+    # the next load must come from the cache as the simulation is gone
+    os.remove(os.path.join(str(tmpdir), "netcdf", "timefresnel-root.dat"))
+    cached = zxr.load_waveforms("netcdf", str(tmpdir))
+
+    xr.testing.assert_identical(cached, expected)
+
+
+def test_load_waveforms_netcdf_cache_error(tmpdir: str, monkeypatch: Any) -> None:
+    """
+    Check that errors while writing the NetCDF cache are reported.
+    """
+    make_simulation(str(tmpdir), "failed", [20, 20])
+
+    def fail(dataset: xr.Dataset, cachefile: str) -> None:
+        raise OSError("disk full")
+
+    monkeypatch.setattr(zxr, "_write_cache", fail)
+
+    # the error is raised when waiting for the cache
+    zxr.load_waveforms("failed", str(tmpdir))
+    with pytest.raises(RuntimeError, match="failed.raw.nc"):
+        zxr._wait_for_writes()
+
+    # or otherwise warned about by the next load
+    zxr.load_waveforms("failed", str(tmpdir))
+    for thread in list(zxr._PENDING_WRITES):
+        thread.join()
+    with pytest.warns(RuntimeWarning, match="disk full"):
+        zxr.load_waveforms("failed", str(tmpdir), write_netcdf=False)
+
+    assert not zxr._FAILED_WRITES
+    assert not os.path.exists(os.path.join(str(tmpdir), "failed", "failed.raw.nc"))
+
+
+def test_load_waveforms_lazy(tmpdir: str) -> None:
+    """
+    Check that a lazily loaded cache gives the same (trimmed) waveforms.
+    """
+    da = pytest.importorskip("dask.array")
+    make_simulation(str(tmpdir), "lazy", [40, 40, 40])
+
+    # write the NetCDF cache
+    zxr.load_waveforms("lazy", str(tmpdir))
+    zxr._wait_for_writes()
+
+    eager = zxr.load_waveforms("lazy", str(tmpdir))
+    lazy = zxr.load_waveforms("lazy", str(tmpdir), lazy=True)
+
+    assert isinstance(lazy.waveforms.data, da.Array)
+    assert isinstance(eager.waveforms.data, np.ndarray)
+    xr.testing.assert_identical(lazy.compute(), eager)
+
+    # trimming and resampling reads the lazy waveforms
+    for kwargs in ({"trim": (2.0, 4.0)}, {"resample": 4.0}, {"resample": 3.0}):
+        expected = zxr.load_waveforms("lazy", str(tmpdir), **kwargs)
+        loaded = zxr.load_waveforms("lazy", str(tmpdir), lazy=True, **kwargs)
+        xr.testing.assert_allclose(loaded.compute(), expected)
@@ -1,5 +1,23 @@
+import sys
+from typing import Any
+
 from .aires import Task  # noqa: F401
-from .loader import load_properties, load_waveforms  # noqa: F401
 
 # the current version
 __version__ = "0.2.1"
+
+# the loaders are only imported when they are first used (PEP 562)
+if sys.version_info < (3, 7):
+    from .loader import load_many, load_properties, load_waveforms  # noqa: F401
+else:
+
+    def __getattr__(name: str) -> Any:
+        """
+        Lazily import the waveform and property loaders.
+        """
+        if name in ("load_many", "load_properties", "load_waveforms"):
+            from . import loader
+
+            return getattr(loader, name)
+
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
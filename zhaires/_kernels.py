@@ -0,0 +1,250 @@
+"""
+Kernels for the hot loops in zhaires.
+
+If numba is installed, these are JIT-compiled and run in parallel.
+Otherwise, equivalent (but slower) NumPy implementations are used.
+"""
+
+import numpy as np
+
+# numba is optional
+try:
+    from numba import njit, prange
+
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+
+def _fill_waveforms(
+    raw: np.ndarray,
+    columns: np.ndarray,
+    starts: np.ndarray,
+    nsamples: np.ndarray,
+    out: np.ndarray,
+) -> None:
+    """
+    Copy the waveform of each antenna out of the raw ZHAireS table.
+
+    For each antenna `i` and each field `f`, this copies `nsamples[i]` rows
+    of column `columns[f]` starting at row `starts[i]` into `out[i, f]`.
+    Any remaining samples in `out` are left untouched.
+
+    Parameters
+    ----------
+    raw: np.ndarray
+        The (columns, rows) raw table.
+    columns: np.ndarray
+        The column of `raw` to copy into each field of `out`.
+    starts: np.ndarray
+        The first row of each antenna.
+    nsamples: np.ndarray
+        The number of samples to copy for each antenna.
+    out: np.ndarray
+        The (antennas, fields, length) output array.
+
+    Returns
+    -------
+    None
+    """
+    for i in range(starts.shape[0]):
+        out[i, :, : nsamples[i]] = raw[columns, starts[i] : starts[i] + nsamples[i]]
+
+
+if HAS_NUMBA:
+
+    @njit(parallel=True, cache=True)  # type: ignore
+    def fill_waveforms(
+        raw: np.ndarray,
+        columns: np.ndarray,
+        starts: np.ndarray,
+        nsamples: np.ndarray,
+        out: np.ndarray,
+    ) -> None:
+        # each antenna is copied in parallel
+        for i in prange(starts.shape[0]):
+            for f in range(columns.shape[0]):
+                for j in range(nsamples[i]):
+                    out[i, f, j] = raw[columns[f], starts[i] + j]
+
+    fill_waveforms.__doc__ = _fill_waveforms.__doc__
+
+else:
+    fill_waveforms = _fill_waveforms  # type: ignore
+
+
+def _find_peaks(waveforms: np.ndarray) -> np.ndarray:
+    """
+    Find the sample with the largest absolute value in each waveform.
+
+    The peak is taken over every polarization of each antenna.
+
+    Parameters
+    ----------
+    waveforms: np.ndarray
+        The (antennas, polarizations, length) waveforms.
+
+    Returns
+    -------
+    ipeak: np.ndarray
+        The index of the peak (along the last axis) of each antenna.
+    """
+    return np.argmax(np.abs(waveforms).max(axis=1), axis=1)
+
+
+if HAS_NUMBA:
+
+    @njit(parallel=True, cache=True)  # type: ignore
+    def find_peaks(waveforms: np.ndarray) -> np.ndarray:
+        # the peak of each antenna
+        ipeak = np.zeros(waveforms.shape[0], dtype=np.int64)
+
+        # each antenna is searched in a single pass in parallel
+        for i in prange(waveforms.shape[0]):
+            peak = -1.0
+            for p in range(waveforms.shape[1]):
+                for j in range(waveforms.shape[2]):
+                    value = abs(waveforms[i, p, j])
+                    # ties go to the earliest sample (like np.argmax)
+                    if value > peak or (value == peak and j < ipeak[i]):
+                        peak = value
+                        ipeak[i] = j
+
+        return ipeak
+
+    find_peaks.__doc__ = _find_peaks.__doc__
+
+else:
+    find_peaks = _find_peaks  # type: ignore
+
+
+def _trim_waveforms(waveforms: np.ndarray, starts: np.ndarray, out: np.ndarray) -> None:
+    """
+    Copy a window of each waveform into `out`.
+
+    The window of antenna `i` starts at sample `starts[i]` and is
+    `out.shape[-1]` samples long. Any part of the window that is outside
+    the waveform (before the first or after the last sample) is zeroed.
+
+    Parameters
+    ----------
+    waveforms: np.ndarray
+        The (antennas, polarizations, length) waveforms.
+    starts: np.ndarray
+        The first sample of the window of each antenna (can be negative).
+    out: np.ndarray
+        The (antennas, polarizations, window) output array.
+
+    Returns
+    -------
+    None
+    """
+    length, N = waveforms.shape[-1], out.shape[-1]
+
+    # the padding is zero
+    out[...] = 0
+
+    for i in range(starts.shape[0]):
+        # the part of the window that is inside the waveform
+        lo, hi = max(starts[i], 0), min(starts[i] + N, length)
+        if lo < hi:
+            out[i, :, lo - starts[i] : hi - starts[i]] = waveforms[i, :, lo:hi]
+
+
+if HAS_NUMBA:
+
+    @njit(parallel=True, cache=True)  # type: ignore
+    def trim_waveforms(
+        waveforms: np.ndarray, starts: np.ndarray, out: np.ndarray
+    ) -> None:
+        length, N = waveforms.shape[-1], out.shape[-1]
+
+        # each antenna is copied (and zero-padded) in parallel
+        for i in prange(starts.shape[0]):
+            for p in range(waveforms.shape[1]):
+                for k in range(N):
+                    j = starts[i] + k
+                    out[i, p, k] = waveforms[i, p, j] if 0 <= j < length else 0.0
+
+    trim_waveforms.__doc__ = _trim_waveforms.__doc__
+
+else:
+    trim_waveforms = _trim_waveforms  # type: ignore
+
+
+def _resample_cubic(waveforms: np.ndarray, ratio: float, out: np.ndarray) -> None:
+    """
+    Resample uniformly sampled waveforms with Catmull-Rom cubic interpolation.
+
+    Sample `k` of `out` is the waveform interpolated at (fractional) sample
+    `k * ratio` of the input. The waveforms are held constant beyond their
+    first and last samples.
+
+    Parameters
+    ----------
+    waveforms: np.ndarray
+        The (antennas, polarizations, length) waveforms.
+    ratio: float
+        The new sampling period divided by the current sampling period.
+    out: np.ndarray
+        The (antennas, polarizations, new length) output array.
+
+    Returns
+    -------
+    None
+    """
+    length = waveforms.shape[-1]
+
+    # the (fractional) input sample of each output sample
+    x = np.arange(out.shape[-1]) * ratio
+    i = np.floor(x).astype(np.int64)
+    u = x - i
+
+    # the four samples around each output sample
+    p0 = waveforms[..., np.clip(i - 1, 0, length - 1)]
+    p1 = waveforms[..., np.clip(i, 0, length - 1)]
+    p2 = waveforms[..., np.clip(i + 1, 0, length - 1)]
+    p3 = waveforms[..., np.clip(i + 2, 0, length - 1)]
+
+    # the coefficients of the Catmull-Rom spline
+    c1 = p2 - p0
+    c2 = 2 * p0 - 5 * p1 + 4 * p2 - p3
+    c3 = 3 * (p1 - p2) + p3 - p0
+
+    # and evaluate it
+    out[...] = p1 + 0.5 * u * (c1 + u * (c2 + u * c3))
+
+
+if HAS_NUMBA:
+
+    @njit(parallel=True, fastmath=True, cache=True)  # type: ignore
+    def resample_cubic(waveforms: np.ndarray, ratio: float, out: np.ndarray) -> None:
+        last = waveforms.shape[-1] - 1
+
+        # each antenna is resampled in parallel
+        for a in prange(waveforms.shape[0]):
+            for k in range(out.shape[-1]):
+
+                # the input sample (and the fraction past it)
+                x = k * ratio
+                i = int(np.floor(x))
+                u = x - i
+
+                # the indices of the four samples around it
+                i0, i1 = min(max(i - 1, 0), last), min(max(i, 0), last)
+                i2, i3 = min(max(i + 1, 0), last), min(max(i + 2, 0), last)
+
+                for p in range(waveforms.shape[1]):
+                    p0, p1 = waveforms[a, p, i0], waveforms[a, p, i1]
+                    p2, p3 = waveforms[a, p, i2], waveforms[a, p, i3]
+
+                    # the coefficients of the spline
+                    c1 = p2 - p0
+                    c2 = 2 * p0 - 5 * p1 + 4 * p2 - p3
+                    c3 = 3 * (p1 - p2) + p3 - p0
+                    out[a, p, k] = p1 + 0.5 * u * (c1 + u * (c2 + u * c3))
+
+    resample_cubic.__doc__ = _resample_cubic.__doc__
+
+else:
+    resample_cubic = _resample_cubic  # type: ignore
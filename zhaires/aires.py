@@ -1,10 +1,20 @@
 import os
+import shutil
 import subprocess
-from typing import Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from types import TracebackType
+from typing import Iterable, Iterator, Optional, Tuple, Type, Union
+
+import numpy as np
 
 from .path import get_run_directory
 from .utils import find_aires
 
+# pre-encoded templates for commands that are sent in bulk
+_ADD_ANTENNA = b"AddAntenna %.17g %.17g %.17g\n"
+_ADD_LINE_ANTENNA = b"AddAntenna Line %.17g %.17g %.17g %.17g %.17g %.17g %d\n"
+_ADD_RING_ANTENNA = b"AddAntenna Ring %.17g %.17g %.17g %.17g %.17g %d\n"
+
 
 class Task(object):
     """
@@ -14,17 +24,32 @@ class Task(object):
     can optionally load a file containing default commands.
 
     If `verbose` is provided, all commands are echoed to stdout.
+
+    A Task can also be used as a context manager. Inside the `with`
+    block, commands are buffered and only written to Aires (in a single
+    write) when the block exits, or when the task is run or exited.
+
+    >>> with zhaires.Task() as sim:
+    ...     sim.task_name("my_aires_task")
+    ...     sim.primary_energy(1, "EeV")
+    >>> sim.run()
     """
 
     # the subprocess for Aire
     process: Optional[subprocess.Popen] = None
 
+    # the commands that have not yet been written to Aires
+    _buffer: bytearray
+
+    # if True, commands are held in `_buffer` until `flush` is called
+    _buffered: bool = False
+
     def __init__(
         self,
         program: str = None,
         cmdfile: str = None,
         verbose: bool = False,
-        directory: str = get_run_directory(),
+        directory: Optional[str] = None,
     ):
         """
         Create a new Aires task.
@@ -37,9 +62,9 @@ class Task(object):
            The path to a file containing default commands to run.
         verbose: bool
            If True, echo all commands before they are run.
-        directory: str
+        directory: str, optional
            The directory to save the simulation.
-           If None, use the current directory.
+           If None, use the run directory (see `get_run_directory`).
         """
 
         # the program that we launch to control Aires
@@ -53,14 +78,17 @@ class Task(object):
         # save the verbose flag
         self.verbose = verbose
 
-        # open Aires
-        self.process = subprocess.Popen(aires, stdin=subprocess.PIPE)
+        # create an empty command buffer
+        self._buffer = bytearray()
+
+        # open Aires - stdin is unbuffered as we do our own buffering
+        self.process = subprocess.Popen(aires, stdin=subprocess.PIPE, bufsize=0)
 
         # try and load commands from a file
         self.load_from_file(cmdfile)
 
         # save the directory
-        self.directory = directory
+        self.directory = directory if directory else get_run_directory()
 
         # and set the run directory
         self.file_directory(self.directory, files="All")
@@ -68,14 +96,37 @@ class Task(object):
         # create a Remark that this simulation was created by pyaires
         self.remark("Task generated using zhaires.py")
 
-    def __exit__(self) -> None:
+    def __enter__(self) -> "Task":
+        """
+        Start buffering commands until the end of the `with` block.
+        """
+        self._buffered = True
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
         """
-        Ensure that the aires process is closed upon exit.
+        Write all buffered commands to Aires in a single write.
+
+        If the `with` block raised an exception, the buffered
+        commands are discarded and the Aires process is closed.
         """
-        if self.process:
-            self.exit()
-            self.process.terminate()
+        self._buffered = False
+
+        # if something went wrong, don't send a partial task to Aires
+        if exc_type is not None:
+            self._buffer.clear()
+            if self.process is not None:
+                self.process.terminate()
             self.process = None
+            return
+
+        # otherwise, send all the commands to Aires
+        self.flush()
 
     def __call__(self, cmd: str) -> None:
         """
@@ -96,6 +147,9 @@ class Task(object):
         """
         Load an Aires command/input file by filename.
 
+        Unless `verbose` is set (in which case every command is
+        echoed), the file is copied to Aires without being parsed.
+
         Parameters
         ----------
         cmdfile: str
@@ -107,21 +161,68 @@ class Task(object):
         """
 
         # check that we actually got given a file
-        if cmdfile is not None:
-            # try and open the file
-            with open(cmdfile, "r") as fp:
+        if cmdfile is None:
+            return
 
-                # loop over all the lines in the file
+        # if we are verbose, process the file line-by-line so we echo each command
+        if self.verbose:
+            with open(cmdfile, "r") as fp:
                 for line in fp:
                     self.read_cmd(line)
-
-    def read_cmd(self, cmd: str) -> None:
+            return
+
+        # otherwise, we pass the raw bytes of the file straight to Aires
+        with open(cmdfile, "rb") as fp:
+
+            # if we are buffering, just add the file to the buffer
+            if self._buffered:
+                contents = fp.read()
+                if contents:
+                    self.read_cmd(contents)
+                return
+
+            # check that we have a valid session
+            if self.process is None:
+                raise ValueError("Attempt to write command with NULL process!")
+
+            # make sure any earlier commands reach Aires before the file
+            self.flush()
+
+            # the size of the file and the number of bytes written so far
+            size = os.fstat(fp.fileno()).st_size
+            offset = 0
+
+            # let the kernel copy the file into the pipe
+            try:
+                while offset < size:
+                    sent = os.sendfile(
+                        self.process.stdin.fileno(),  # type: ignore
+                        fp.fileno(),
+                        offset,
+                        size - offset,
+                    )
+                    if sent == 0:
+                        break
+                    offset += sent
+            except (AttributeError, OSError):
+                # sendfile is not available (or can't write to pipes) on
+                # this platform so copy the rest of the file ourselves.
+                fp.seek(offset)
+                shutil.copyfileobj(fp, self.process.stdin, 65536)  # type: ignore
+
+            # make sure that the last command in the file is terminated
+            if size > 0:
+                fp.seek(-1, os.SEEK_END)
+                if fp.read(1) != b"\n":
+                    self._write_bytes(b"\n")
+
+    def read_cmd(self, cmd: Union[str, bytes]) -> None:
         """
         Read and process an Aires command in a string.
 
         Parameters
         ----------
-        cmd: str
+        cmd: str or bytes
             The Aires command to process
 
         Returns
@@ -129,6 +230,32 @@ class Task(object):
         None
         """
 
+        # convert it to bytes
+        if isinstance(cmd, str):
+            cmd = cmd.encode()
+
+        # add a newline if it doesn't already exist
+        if not cmd.endswith(b"\n"):
+            cmd += b"\n"
+
+        # and send it to Aires
+        self._write_bytes(cmd)
+
+    def _write_bytes(self, cmd: bytes) -> None:
+        """
+        Add one or more encoded, newline-terminated, commands to
+        the command buffer and write it to Aires if we are not buffering.
+
+        Parameters
+        ----------
+        cmd: bytes
+            The encoded Aires command(s) to process.
+
+        Returns
+        -------
+        None
+        """
+
         # check that we have a valid sessions
         if not self.process:
             msg = (
@@ -139,33 +266,140 @@ class Task(object):
 
         # if verbose, print the cmd before we run it
         if self.verbose:
-            print(cmd)
+            print(cmd.decode(), end="")
 
-        # add a newline if it doesn't already exist
-        if cmd[-1] != "\n":
-            cmd += "\n"
+        # add it to the command buffer
+        self._buffer += cmd
 
-        # convert it to bytes and write it to stdin
-        if self.process is not None:
-            self.process.stdin.write(cmd.encode())  # type: ignore
+        # and if we are not buffering, send it to Aires immediately
+        if not self._buffered:
+            self.flush()
 
-            # and flush stdin to the Aires subprocess
-            self.process.stdin.flush()  # type: ignore
-        else:
-            raise ValueError(f"Attempt to write command with NULL process!")
+    def flush(self) -> None:
+        """
+        Write all buffered commands to the Aires subprocess.
+
+        Returns
+        -------
+        None
+        """
+
+        # there is nothing to do if the buffer is empty
+        if not self._buffer:
+            return
+
+        if self.process is None:
+            raise ValueError("Attempt to write command with NULL process!")
+
+        # stdin is unbuffered so this writes directly to the pipe
+        fd = self.process.stdin.fileno()  # type: ignore
+
+        # write the buffer without copying it - `write` may
+        # be partial for large buffers so loop until it's all out
+        written = 0
+        with memoryview(self._buffer) as view:
+            while written < len(view):
+                written += os.write(fd, view[written:])
+
+        # and clear the buffer now that it has been written
+        self._buffer.clear()
 
     def run(self) -> None:
         """
-        Start the task.
+        Start the task and wait for it to finish.
 
         Returns
         -------
         None
         """
         if self.process is not None:
+            self.flush()
             self.process.communicate()  # type: ignore
         else:
-            raise ValueError(f"Attempting to start a simulation with a NULL process!")
+            raise ValueError("Attempting to start a simulation with a NULL process!")
+
+    def start(self) -> None:
+        """
+        Start the task without waiting for it to finish.
+
+        Returns
+        -------
+        None
+        """
+        if self.process is None:
+            raise ValueError("Attempting to start a simulation with a NULL process!")
+
+        # send any remaining commands to Aires
+        self.flush()
+
+        # and close stdin - Aires starts the simulation once its input ends
+        self.process.stdin.close()  # type: ignore
+
+    def wait(self) -> int:
+        """
+        Wait for a started task to finish.
+
+        Returns
+        -------
+        returncode: int
+            The exit code of the Aires process.
+        """
+        if self.process is None:
+            raise ValueError("Attempting to wait for a simulation with a NULL process!")
+
+        return self.process.wait()
+
+    @classmethod
+    def run_many(
+        cls, tasks: Iterable["Task"], max_parallel: Optional[int] = None
+    ) -> Iterator["Task"]:
+        """
+        Run several tasks in parallel.
+
+        At most `max_parallel` tasks are simulated at once. The tasks are
+        started immediately and are yielded as they finish so that their
+        output can be loaded while the other tasks are still running.
+
+        Example: for task in Task.run_many([sim1, sim2, sim3]): ...
+
+        Parameters
+        ----------
+        tasks: Iterable[Task]
+            The configured tasks to run.
+        max_parallel: int, optional
+            The maximum number of simultaneous tasks.
+            If None, use the number of CPUs.
+
+        Returns
+        -------
+        completed: Iterator[Task]
+            The tasks in the order that they finished.
+        """
+
+        # each worker thread starts (and waits on) one Aires process at a time
+        executor = ThreadPoolExecutor(max_workers=max_parallel or os.cpu_count())
+
+        def run(task: "Task") -> int:
+            """
+            Start a task and wait for it to finish.
+            """
+            task.start()
+            return task.wait()
+
+        # start all the tasks and let the executor shut down once they finish
+        futures = {executor.submit(run, task): task for task in tasks}
+        executor.shutdown(wait=False)
+
+        def completed() -> Iterator["Task"]:
+            """
+            Yield each task as it finishes.
+            """
+            for future in as_completed(futures):
+                # re-raise any exception that occurred while running the task
+                future.result()
+                yield futures[future]
+
+        return completed()
 
     def exit(self) -> None:
         """
@@ -178,6 +412,9 @@ class Task(object):
         # write the exit command
         self.read_cmd("Exit")
 
+        # make sure that Aires receives everything
+        self.flush()
+
         # and close down the process
         if self.process is not None:
             self.process.terminate()  # type: ignore
@@ -226,7 +463,7 @@ class Task(object):
 
         Example: self.max_cpu_time_per_run(1)
         """
-        self.read_cmd(f"MaxCpuTimePerRun {float(time)} {unit}")
+        self.read_cmd(f"MaxCpuTimePerRun {time} {unit}")
 
     def primary_particle(self, particle: str) -> None:
         """
@@ -244,7 +481,7 @@ class Task(object):
         Example: self.primary_energy(1e16)
         Example: self.primary_energy(10, 'PeV')
         """
-        self.read_cmd(f"PrimaryEnergy {float(energy)} {unit}")
+        self.read_cmd(f"PrimaryEnergy {energy} {unit}")
 
     def primary_zenith(self, zenith: float) -> None:
         """
@@ -252,7 +489,7 @@ class Task(object):
 
         Example: self.primary_zenith(80)
         """
-        self.read_cmd(f"PrimaryZenAngle {float(zenith)} deg")
+        self.read_cmd(f"PrimaryZenAngle {zenith} deg")
 
     def primary_azimuth(self, azimuth: float, geographic: bool = False) -> None:
         """
@@ -267,7 +504,7 @@ class Task(object):
         suffix = "Geographic" if geographic else ""
 
         # and then write the command
-        self.read_cmd(f"PrimaryAzimAngle {float(azimuth)} deg {suffix}")
+        self.read_cmd(f"PrimaryAzimAngle {azimuth} deg {suffix}")
 
     def injection_altitude(self, altitude: float, unit: str = "km") -> None:
         """
@@ -276,7 +513,7 @@ class Task(object):
 
         Example: self.injection_altitude(120, 'km')
         """
-        self.read_cmd(f"InjectionAltitude {float(altitude)} {unit}")
+        self.read_cmd(f"InjectionAltitude {altitude} {unit}")
 
     def ground_altitude(self, altitude: float, unit: str = "km") -> None:
         """
@@ -285,7 +522,7 @@ class Task(object):
 
         Example: self.ground_altitude(120, 'km')
         """
-        self.read_cmd(f"GroundAltitude {float(altitude)} {unit}")
+        self.read_cmd(f"GroundAltitude {altitude} {unit}")
 
     def site(self, site: str) -> None:
         """
@@ -334,9 +571,9 @@ class Task(object):
         """
         # if this is a relative thinning energy
         if relative:
-            self.read_cmd(f"ThinningEnergy {float(energy)} Relative")
+            self.read_cmd(f"ThinningEnergy {energy} Relative")
         else:  # otherwise it is an absolute energy
-            self.read_cmd(f"ThinningEnergy {float(energy)} {unit}")
+            self.read_cmd(f"ThinningEnergy {energy} {unit}")
 
     def thinning_w_factor(self, factor: float) -> None:
         """
@@ -344,7 +581,7 @@ class Task(object):
 
         Example: self.thinning_w_factor(0.06)
         """
-        self.read_cmd(f"ThinningWFactor {float(factor)}")
+        self.read_cmd(f"ThinningWFactor {factor}")
 
     def date(self, date: float) -> None:
         """
@@ -413,7 +650,7 @@ class Task(object):
         Example: self.time_domain_bin(0.5, 'ps')
         """
         # and pass it to Aires
-        self.read_cmd(f"TimeDomainBin {float(time)} {unit}")
+        self.read_cmd(f"TimeDomainBin {time} {unit}")
 
     def add_antenna(self, x: float, y: float, z: float = 0.0) -> None:
         """
@@ -424,7 +661,33 @@ class Task(object):
         Example: self.add_antenna(320, 5700, 1200
         """
         # and pass it to Aires
-        self.read_cmd(f"AddAntenna {float(x)} {float(y)} {float(z)}")
+        self._write_bytes(_ADD_ANTENNA % (x, y, z))
+
+    def add_antennas(self, points: np.ndarray) -> None:
+        """
+        Creates an antenna at each (x, y, z) row of `points` in m
+        w.r.t coordinate origin.
+
+        This is much faster than calling `add_antenna` in a loop
+        as all the antennas are sent to Aires in a single write.
+
+        Example: self.add_antennas([(3, 5, 0), (320, 5700, 1200)])
+        Example: self.add_antennas(np.zeros((100, 3)))
+        """
+        # make sure that we have an (N, 3) array of positions
+        points = np.asarray(points, dtype=np.float64)
+        if points.ndim != 2 or points.shape[1] != 3:
+            raise ValueError(f"`points` must have shape (N, 3), not {points.shape}.")
+
+        # there is nothing to do if we have no antennas
+        if points.shape[0] == 0:
+            return
+
+        # format every antenna command at once
+        cmds = (_ADD_ANTENNA * points.shape[0]) % tuple(points.ravel())
+
+        # and pass them to Aires
+        self._write_bytes(cmds)
 
     def add_line_antenna(
         self,
@@ -437,14 +700,8 @@ class Task(object):
 
         Example: self.add_line_antenna((0, 0, 0), (100, 1200, 0), 20)
         """
-        # the start location string
-        startstr = f"{float(start[0])} {float(start[1])} {float(start[2])}"
-
-        # the end location string
-        endstr = f"{float(end[0])} {float(end[1])} {float(end[2])}"
-
         # and pass it to Aires
-        self.read_cmd(f"AddAntenna Line {startstr} {endstr} {int(nant)}")
+        self._write_bytes(_ADD_LINE_ANTENNA % (*start, *end, nant))
 
     def add_ring_antenna(
         self, origin: Tuple[float, float, float], radius: float, phi0: float, nant: int
@@ -456,14 +713,8 @@ class Task(object):
 
         Example: self.add_ring_antenna((0, 0, 0), (100, 1200, 0), 20)
         """
-        # the start location string
-        originstr = f"{float(origin[0])} {float(origin[1])} {float(origin[2])}"
-
-        # and construct the command
-        cmd = f"{originstr} {float(radius)} {float(phi0)} {int(nant)}"
-
         # and pass it to Aires
-        self.read_cmd(f"AddAntenna Ring {cmd}")
+        self._write_bytes(_ADD_RING_ANTENNA % (*origin, radius, phi0, nant))
 
     def delete_antennas(self) -> None:
         """
@@ -492,7 +743,7 @@ class Task(object):
 
         Example: self.random_seed(0.1298004637)
         """
-        self.read_cmd(f"RandomSeed {float(seed)}")
+        self.read_cmd(f"RandomSeed {seed}")
 
     def file_directory(self, directory: str, files: str = "All") -> None:
         """
@@ -1,17 +1,206 @@
 import os
 import re
-from typing import Mapping
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, List, Mapping, NamedTuple, Optional, Sequence
 
 import numpy as np
 
+from . import _kernels
 from .path import get_run_directory
 
-__all__ = ["load_properties", "load_waveforms"]
+# since numpy 1.23, np.loadtxt uses a C parser that is faster than pandas.
+# before that, pandas (if it is installed) is much faster at parsing large files
+if tuple(int(v) for v in np.__version__.split(".")[:2]) < (1, 23):
+    try:
+        import pandas as pd
+    except ImportError:
+        pd = None
+else:
+    pd = None
+
+__all__ = ["Waveforms", "load_properties", "load_waveforms", "load_many"]
+
+# the regular expressions used to extract properties from the summary file -
+# these are searched over the whole file so they must not match across lines
+_PATTERNS = {
+    "energy": re.compile(r"Primary energy: (\d+\.\d+) ([a-zA-Z]{3})"),
+    "particle": re.compile(r"Primary particle: ([a-zA-Z]*)"),
+    "zenith": re.compile(r"Primary zenith angle:[ \t]*(\d+\.\d+)"),
+    "azimuth": re.compile(r"Primary azimuth angle:[ \t]*(-?\d+\.\d+)"),
+    "lat_lon": re.compile(
+        r"\(Lat:[ \t]*(-?\d+\.\d+)[ \t]*deg\.[ \t]*Long:[ \t]*(-?\d+\.\d+)"
+    ),
+    "ground": re.compile(r"Ground altitude:[ \t]*(\d+\.\d+)"),
+    "injection": re.compile(r"Injection altitude:[ \t]*(\d+\.\d+)"),
+    "mag_str": re.compile(r"Intensity:[ \t]*(\d+\.\d+) uT"),
+    "mag_inc": re.compile(r"I:[ \t]*(-?\d+\.\d+) deg"),
+    "mag_dec": re.compile(r"D:[ \t]*(-?\d+\.\d+) deg"),
+    "dt": re.compile(r"Time bin size:[ \t]*(-?\d+\.\d+)ns"),
+    "rindex": re.compile(r"Refraction index at sea level:(-?\d+\.\d+)"),
+    "thinning": re.compile(r"Thinning energy:[ \t]*(\d+\.\d+E-?\d+)"),
+    "xmax": re.compile(r"Sl\. depth of max\. \(g/cm2\):[ \t]*(\d+\.\d+)"),
+}
+
+# a single regex that matches any of the above, named by the property
+_SUMMARY = re.compile(
+    "|".join(f"(?P<{key}>{pattern.pattern})" for key, pattern in _PATTERNS.items())
+)
+
+# the columns of timefresnel-root.dat that we use: the antenna number,
+# the antenna position (x, y, z), the sample time and the field (x, y, z)
+_TIMEFRESNEL_COLUMNS = (1, 2, 3, 4, 5, 11, 12, 13)
+
+# uniform waveforms are only copied by several threads if the field is at least
+# this large (in bytes) - below this, starting the threads takes longer than the copy
+_PARALLEL_COPY_BYTES = 4 * 1024 * 1024
+
+# the maximum number of threads that copy the waveforms (if None, one per CPU) -
+# this is 1 in the worker processes of `load_many` as they already run in parallel
+_COPY_THREADS: Optional[int] = None
+
+# the per-antenna arrays stored in a `Waveforms` (and its cache file)
+_WAVEFORM_FIELDS = ("t", "E", "positions")
+
+# the properties that are copied into every record of `Waveforms.to_records`
+_PROPERTY_FIELDS = (
+    "energy",
+    "zenith",
+    "azimuth",
+    "lat",
+    "lon",
+    "ground",
+    "mag_str",
+    "mag_inc",
+    "mag_dec",
+)
+
+# the fixed-size fields of each record - the properties and antenna position
+_SCALAR_FIELDS = [(field, "float32") for field in _PROPERTY_FIELDS + ("x", "y", "z")]
+
+
+@lru_cache(maxsize=None)
+def _dtype(length: int) -> np.dtype:
+    """
+    The structured dtype of the records returned by `Waveforms.to_records`.
+
+    Parameters
+    ----------
+    length: int
+        The number of samples in each waveform.
+
+    Returns
+    -------
+    dtype: np.dtype
+        The dtype of a single antenna record.
+    """
+    return np.dtype(
+        _SCALAR_FIELDS
+        + [(field, "float32", length) for field in ("t", "Ex", "Ey", "Ez")]
+    )
+
+
+class Waveforms(NamedTuple):
+    """
+    The ZHAireS waveforms and positions of every antenna in a simulation.
+
+    Each field is a separate array indexed by antenna so that the
+    waveforms of each antenna are contiguous. The three electric field
+    components are stored in a single array (`E`) but are also available
+    individually (as views) through `Ex`, `Ey`, and `Ez`. Likewise, the
+    antenna positions are available as `x`, `y`, and `z`.
+    """
+
+    # the (nantennas, length) sample times in ns
+    t: np.ndarray
+
+    # the (nantennas, 3, length) electric field (x, y, z) in V/m
+    E: np.ndarray
+
+    # the (nantennas, 3) antenna positions (x, y, z) in m
+    positions: np.ndarray
+
+    # the properties of the simulation (see `load_properties`)
+    properties: Mapping[str, float]
+
+    @property
+    def Ex(self) -> np.ndarray:
+        """
+        The (nantennas, length) x-component of the electric field in V/m.
+        """
+        return self.E[:, 0, :]
+
+    @property
+    def Ey(self) -> np.ndarray:
+        """
+        The (nantennas, length) y-component of the electric field in V/m.
+        """
+        return self.E[:, 1, :]
+
+    @property
+    def Ez(self) -> np.ndarray:
+        """
+        The (nantennas, length) z-component of the electric field in V/m.
+        """
+        return self.E[:, 2, :]
+
+    @property
+    def x(self) -> np.ndarray:
+        """
+        The (nantennas,) x-coordinate of each antenna in m.
+        """
+        return self.positions[:, 0]
+
+    @property
+    def y(self) -> np.ndarray:
+        """
+        The (nantennas,) y-coordinate of each antenna in m.
+        """
+        return self.positions[:, 1]
+
+    @property
+    def z(self) -> np.ndarray:
+        """
+        The (nantennas,) z-coordinate of each antenna in m.
+        """
+        return self.positions[:, 2]
+
+    def to_records(self) -> np.ndarray:
+        """
+        Convert the waveforms into the structured array (one record
+        per antenna) returned by earlier versions of `load_waveforms`.
+
+        Returns
+        -------
+        waveforms: np.ndarray
+            A structured array containing the waveforms and antenna information.
+        """
+
+        # the number of antennas and the length of each waveform
+        nantennas, length = self.t.shape
+
+        # create the data to store the waveforms
+        data = np.zeros(nantennas, dtype=_dtype(length))
+
+        # fill in the property information (broadcast to every antenna)
+        for key in _PROPERTY_FIELDS:
+            data[key] = self.properties[key]
+
+        # and copy over the per-antenna arrays
+        for field in ("t", "Ex", "Ey", "Ez", "x", "y", "z"):
+            data[field] = getattr(self, field)
+
+        return data
 
 
 def load_waveforms(
-    sim: str, directory: str = get_run_directory(), write_cache: bool = True
-) -> np.ndarray:
+    sim: str,
+    directory: Optional[str] = None,
+    write_cache: bool = True,
+    compress: bool = False,
+) -> Waveforms:
     """
     Load the ZHAireS antenna signals from the simulation with name `sim`
     in the directory `directory`.
@@ -19,108 +208,231 @@ def load_waveforms(
     This assumes that there is only one shower per simulation file.
 
     if `write_cache` is True, the extracted waveforms are saved
-    as a .npy file in the simulation directory. Whenever this simulation
-    is loaded, the .npy file will be loaded directly instead of reloading
-    and reparsing the giant text file. This is orders of magnitude faster
-    when loading large simulations.
+    as .npy files in the simulation directory. Whenever this simulation
+    is loaded, the .npy files will be memory-mapped directly instead of
+    reloading and reparsing the giant text file. This is orders of magnitude
+    faster when loading large simulations. Waveforms loaded from the cache
+    are read-only - use `np.array(...)` to get a modifiable copy.
+
+    If `compress` is also True, the cache is instead written as a single
+    compressed .npz file. This is typically several times smaller but has
+    to be decompressed (into memory) every time it is loaded.
 
     Parameters
     ----------
     sim: str
         The Aires task name for the simulation.
-    directory: str
+    directory: str, optional
         The directory to search for the simulation.
+        If None, use the run directory (see `get_run_directory`).
+    write_cache: bool
+        If True, write .npy cache files to speed up future loads.
+    compress: bool
+        If True, write a compressed .npz cache instead.
 
     Returns
     -------
-    waveforms: np.ndarray
-        A structured array containing the waveforms and antenna information.
+    waveforms: Waveforms
+        The waveforms and positions of each antenna.
     """
 
-    # the filename to save into
-    cachefile = os.path.join(directory, *(sim, "waveforms.npy"))
+    # the directory of the simulation
+    directory = directory if directory else get_run_directory()
+    simdir = os.path.join(directory, sim)
 
-    # if the cachefile exists
-    if os.path.exists(cachefile):
-        return np.load(cachefile)
+    # if this simulation has been cached, load it from there
+    cache = _load_cache(simdir)
+    if cache is not None:
+        return Waveforms(properties=load_properties(sim, directory), **cache)
 
-    # load in the appropriate file using numpy
-    raw = np.loadtxt(os.path.join(directory, *(sim, "timefresnel-root.dat"))).T
+    # load in the columns that we use from the appropriate file
+    raw = _read_table(
+        os.path.join(simdir, "timefresnel-root.dat"),
+        usecols=_TIMEFRESNEL_COLUMNS,
+        dtype=np.float32,
+    ).T
+
+    # the antenna number of each row
+    ids = raw[0, :].astype(np.int64)
+
+    # the rows are normally grouped by antenna - but sort them if not
+    if np.any(ids[1:] < ids[:-1]):
+        order = np.argsort(ids, kind="stable")
+        raw, ids = raw[:, order], ids[order]
 
     # extract the number of antennas
-    nantennas = int(raw[1, -1])  # this is the last entry in the antenna number column.
+    nantennas = int(ids[-1])  # this is the last entry in the antenna number column.
+
+    # find the first (and one past the last) row of each antenna
+    numbers = np.arange(1, nantennas + 1)
+    starts = np.searchsorted(ids, numbers, side="left")
+    ends = np.searchsorted(ids, numbers, side="right")
+
+    # check that every antenna has a waveform
+    if np.any(starts == ends):
+        raise ValueError(f"Some antennas in {sim} do not have any samples.")
 
     # the length of each signal - we overestimate
     length = int(np.ceil(raw.shape[1] / nantennas))
 
-    # create the data to store the waveforms
-    data = np.zeros(
-        nantennas,
-        dtype=[
-            ("energy", "float32"),
-            ("zenith", "float32"),
-            ("azimuth", "float32"),
-            ("lat", "float32"),
-            ("lon", "float32"),
-            ("ground", "float32"),
-            ("mag_str", "float32"),
-            ("mag_inc", "float32"),
-            ("mag_dec", "float32"),
-            ("x", "float32"),
-            ("y", "float32"),
-            ("z", "float32"),
-            ("t", "float32", length),
-            ("Ex", "float32", length),
-            ("Ey", "float32", length),
-            ("Ez", "float32", length),
-        ],
+    # if every antenna has the same number of samples (the usual case),
+    # the time and field are just the raw rows reshaped by antenna
+    if np.all(ends - starts == length):
+        t = np.empty((nantennas, length), dtype=np.float32)
+        E = np.empty((nantennas, 3, length), dtype=np.float32)
+
+        # views of the time and field of each antenna in `raw`
+        tview = raw[4].reshape((nantennas, length))
+        Eview = raw[5:8].reshape((3, nantennas, length)).transpose((1, 0, 2))
+
+        def copy_antennas(start: int, stop: int) -> None:
+            """
+            Copy the time and field of a block of antennas.
+            """
+            t[start:stop] = tview[start:stop]
+            E[start:stop] = Eview[start:stop]
+
+        # the number of threads (and blocks of antennas) that we copy with
+        workers = min(nantennas, _COPY_THREADS or os.cpu_count() or 1)
+
+        # small simulations are copied directly by this thread
+        if workers == 1 or E.nbytes < _PARALLEL_COPY_BYTES:
+            copy_antennas(0, nantennas)
+
+        # otherwise, the copies release the GIL so the blocks are copied in parallel
+        else:
+            bounds = np.linspace(0, nantennas, workers + 1).astype(int)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [
+                    executor.submit(copy_antennas, start, stop)
+                    for start, stop in zip(bounds[:-1], bounds[1:])
+                ]
+
+            # re-raise any exception that occurred while copying
+            for future in futures:
+                future.result()
+
+    # otherwise, copy the waveform of each antenna into zero-filled
+    # arrays - this pads short waveforms and cuts long waveforms
+    else:
+        t = np.zeros((nantennas, length), dtype=np.float32)
+        E = np.zeros((nantennas, 3, length), dtype=np.float32)
+
+        # the number of samples that we copy for each antenna
+        nsamples = np.minimum(ends - starts, length)
+
+        # copy the time and field vectors of every antenna
+        _kernels.fill_waveforms(raw, np.array([4]), starts, nsamples, t[:, None, :])
+        _kernels.fill_waveforms(raw, np.array([5, 6, 7]), starts, nsamples, E)
+
+    # create the waveforms with the (x, y, z) position of every antenna
+    waveforms = Waveforms(
+        t=t,
+        E=E,
+        positions=np.ascontiguousarray(raw.T[starts, 1:4]),
+        properties=load_properties(sim, directory),
     )
 
-    # load the properties dict for this simulation
-    props = load_properties(sim, directory)
-
-    # loop over the number of antennas
-    for iant in np.arange(0, nantennas):
-
-        # get the indices of the values corresponding to this antenna
-        antidx = raw[1, :] == (iant + 1)
-
-        # fill in the property information
-        for key in [
-            "energy",
-            "zenith",
-            "azimuth",
-            "lat",
-            "lon",
-            "ground",
-            "mag_str",
-            "mag_inc",
-            "mag_dec",
-        ]:
-            data[iant][key] = props[key]
-
-        # fill in the position and time
-        data[iant]["x"] = raw[2, antidx][0]
-        data[iant]["y"] = raw[3, antidx][0]
-        data[iant]["z"] = raw[4, antidx][0]
-        data[iant]["t"] = __pad_or_cut(raw[5, antidx], length)
-
-        # and fill in the field vectors
-        data[iant]["Ex"] = __pad_or_cut(raw[11, antidx], length)
-        data[iant]["Ey"] = __pad_or_cut(raw[12, antidx], length)
-        data[iant]["Ez"] = __pad_or_cut(raw[13, antidx], length)
-
-    # now that we have the array, write the cache if desired
+    # now that we have the waveforms, write the cache if desired
     if write_cache:
-        np.save(cachefile, data)
+        _save_cache(simdir, waveforms, compress)
 
     # and we are done.
-    return data
+    return waveforms
+
+
+def load_many(
+    sims: Sequence[str],
+    directory: Optional[str] = None,
+    n_workers: Optional[int] = None,
+) -> List[Waveforms]:
+    """
+    Load the ZHAireS antenna signals from several simulations in parallel.
+
+    Every simulation that has not been cached is parsed (and cached)
+    in a separate process. The waveforms of every simulation are then
+    memory-mapped from the cache - so they are only read from disk as
+    they are used and are read-only (see `load_waveforms`).
+
+    Parameters
+    ----------
+    sims: Sequence[str]
+        The Aires task names of the simulations.
+    directory: str, optional
+        The directory to search for the simulations.
+        If None, use the run directory (see `get_run_directory`).
+    n_workers: int, optional
+        The maximum number of simultaneous processes.
+        If None, use the number of CPUs.
+
+    Returns
+    -------
+    waveforms: List[Waveforms]
+        The waveforms of each simulation (in the same order as `sims`).
+    """
+
+    # the directory of the simulations
+    directory = directory if directory else get_run_directory()
+
+    # the simulations that still have to be parsed - each one is only parsed
+    # once (by a single worker) even if it is repeated in `sims`
+    uncached = [
+        sim
+        for sim in dict.fromkeys(sims)
+        if not _has_cache(os.path.join(directory, sim))
+    ]
+
+    # parse and cache each simulation in a worker process - only the
+    # cache files (and not the waveforms) are sent back to this process
+    if uncached:
+        with ProcessPoolExecutor(
+            max_workers=n_workers, initializer=_init_worker
+        ) as executor:
+            futures = [
+                executor.submit(_cache_waveforms, sim, directory) for sim in uncached
+            ]
+
+            # re-raise any exception that occurred while parsing
+            for future in futures:
+                future.result()
+
+    # and load (memory-map) every simulation from its cache
+    return [load_waveforms(sim, directory) for sim in sims]
+
+
+def _init_worker() -> None:
+    """
+    Copy the waveforms with a single thread in the worker processes of `load_many`.
+
+    Returns
+    -------
+    None
+    """
+    global _COPY_THREADS
+    _COPY_THREADS = 1
+
+
+def _cache_waveforms(sim: str, directory: str) -> None:
+    """
+    Parse the waveforms of a simulation and write the (uncompressed) cache.
+
+    This is run in the worker processes of `load_many`.
+
+    Parameters
+    ----------
+    sim: str
+        The Aires task name for the simulation.
+    directory: str
+        The directory to search for the simulation.
+
+    Returns
+    -------
+    None
+    """
+    load_waveforms(sim, directory, write_cache=True)
 
 
-def load_properties(
-    sim: str, directory: str = get_run_directory()
-) -> Mapping[str, float]:
+def load_properties(sim: str, directory: Optional[str] = None) -> Dict[str, float]:
     """
     Load the various properties of the simulation into a dictionary.
 
@@ -128,8 +440,9 @@ def load_properties(
     ----------
     sim: str
         The name of the simulation to load.
-    directory: str
+    directory: str, optional
         The directory to load the simulation from.
+        If None, use the run directory (see `get_run_directory`).
 
     Returns
     -------
@@ -137,6 +450,35 @@ def load_properties(
         The various properties of the simulation loaded from the ZHAireS file.
     """
 
+    # the summary file for this simulation
+    directory = directory if directory else get_run_directory()
+    filename = os.path.join(directory, sim, f"{sim}.sry")
+
+    # the modification time ensures we reparse the file if it changes - the
+    # parsed properties are shared between calls so return a (cheap) copy
+    return dict(_parse_summary(filename, os.stat(filename).st_mtime_ns))
+
+
+@lru_cache(maxsize=128)
+def _parse_summary(filename: str, mtime: int) -> Mapping[str, float]:
+    """
+    Parse the properties of a simulation from its summary file.
+
+    The results are cached so this is only parsed once per `mtime`.
+
+    Parameters
+    ----------
+    filename: str
+        The path to the summary (.sry) file.
+    mtime: int
+        The modification time of the file (only used for caching).
+
+    Returns
+    -------
+    properties: Mapping
+        A read-only mapping of the properties of the simulation.
+    """
+
     # create the dictionary to store the various properties
     props = {}
 
@@ -154,167 +496,235 @@ def load_properties(
 
         return energy * np.power(10.0, exponent - 18)
 
-    # open the file
-    with open(os.path.join(directory, *(sim, f"{sim}.sry"))) as f:
+    # read the whole summary file
+    with open(filename) as f:
+        contents = f.read()
+
+    # find every property in a single pass over the file
+    for match in _SUMMARY.finditer(contents):
+
+        # the property that we matched
+        key = str(match.lastgroup)
+
+        # and the groups captured by the pattern of this property
+        index = _SUMMARY.groupindex[key]
+        groups = match.groups()[index : index + _PATTERNS[key].groups]
+
+        # the energy has to be converted into EeV
+        if key == "energy":
+            props["energy"] = parse_energy(float(groups[0]), groups[1])
+
+        # the particle is stored as a lowercase string
+        elif key == "particle":
+            props["particle"] = groups[0].lower()  # type: ignore
+
+        # the latitude and longitude are matched together
+        elif key == "lat_lon":
+            props["lat"] = float(groups[0])
+            props["lon"] = float(groups[1])
+
+        # and the remaining properties are all a single number
+        else:
+            props[key] = float(groups[0])
+
+    antenna_start = False
+    antenna_end = False
+    antenna_positions = []
+
+    # loop through the lines in the file
+    for line in contents.splitlines():
+
+        # extract antenna positions
+        if antenna_start and not (antenna_end):
+            values = line.split()
+            if len(values) != 0:
+                if values[0].isdigit():
+                    antenna_positions.append(
+                        [
+                            int(values[0]),
+                            float(values[1]),
+                            float(values[2]),
+                            float(values[3]),
+                            float(values[4]),
+                        ]
+                    )
+        if "Antenna|   X [m]   |   Y [m]   |   Z [m]   |  t0 [ns]" in line:
+            antenna_start = True
+        elif "Time bin size:" in line:
+            antenna_end = True
+    positions = np.array(antenna_positions)
+    positions.setflags(write=False)
+    props["antenna_positions"] = positions  # type: ignore
+
+    # and return a read-only view of the properties dict
+    return MappingProxyType(props)
+
+
+def _has_cache(simdir: str) -> bool:
+    """
+    Check if a simulation has a (complete) waveform cache.
+
+    Unlike `_load_cache`, this only checks the cache files and
+    doesn't memory-map or decompress any of the cached arrays.
+
+    Parameters
+    ----------
+    simdir: str
+        The directory of the simulation.
+
+    Returns
+    -------
+    cached: bool
+        True if the waveforms can be loaded from the cache.
+    """
+
+    # the uncompressed cache - one .npy file per field
+    if all(
+        os.path.exists(os.path.join(simdir, "waveforms", f"{field}.npy"))
+        for field in _WAVEFORM_FIELDS
+    ):
+        return True
+
+    # the compressed cache - this only reads the list of arrays in the file
+    cachefile = os.path.join(simdir, "waveforms.npz")
+    if os.path.exists(cachefile):
+        with np.load(cachefile, allow_pickle=False) as cache:
+            return all(field in cache.files for field in _WAVEFORM_FIELDS)
+
+    return False
+
+
+def _load_cache(simdir: str) -> Optional[Dict[str, np.ndarray]]:
+    """
+    Load the cached waveform arrays of a simulation.
+
+    The uncompressed cache (one .npy file per field) is memory-mapped
+    while the compressed .npz cache is read into memory.
+
+    Parameters
+    ----------
+    simdir: str
+        The directory of the simulation.
+
+    Returns
+    -------
+    cache: Dict[str, np.ndarray], optional
+        The cached arrays of each field or None if there is no cache.
+    """
 
-        antenna_start = False
-        antenna_end = False
-        antenna_positions = []
+    # the uncompressed cache - one .npy file per field
+    filenames = {
+        field: os.path.join(simdir, "waveforms", f"{field}.npy")
+        for field in _WAVEFORM_FIELDS
+    }
 
-        # loop through the lines in a file
-        for count, line in enumerate(f):
+    # if it exists, memory-map it so only the data we use is read
+    if all(os.path.exists(filename) for filename in filenames.values()):
+        return {
+            field: np.load(filename, mmap_mode="r", allow_pickle=False)
+            for field, filename in filenames.items()
+        }
 
-            # match for the primary energy
-            energy_match = re.search(
-                r"\s*Primary energy: (\d+.\d+) ([a-zA-Z]{3})", line
-            )
+    # the compressed cache
+    cachefile = os.path.join(simdir, "waveforms.npz")
 
-            # if we got a match
-            if energy_match:
-                props["energy"] = parse_energy(
-                    float(energy_match.group(1)), energy_match.group(2)
-                )
+    # which has to be decompressed into memory
+    if os.path.exists(cachefile):
+        with np.load(cachefile, allow_pickle=False) as cache:
+            # caches written by older versions have different fields
+            if all(field in cache for field in _WAVEFORM_FIELDS):
+                return {field: cache[field] for field in _WAVEFORM_FIELDS}
+
+    # otherwise, there is no cache
+    return None
 
-            # match for the primary particle
-            particle_match = re.search(r"\s*Primary particle: ([a-zA-Z]*)", line)
 
-            # if we got a match
-            if particle_match:
-                props["particle"] = particle_match.group(1).lower()  # type: ignore
+def _save_cache(simdir: str, waveforms: Waveforms, compress: bool = False) -> None:
+    """
+    Cache the waveform arrays of a simulation.
+
+    Parameters
+    ----------
+    simdir: str
+        The directory of the simulation.
+    waveforms: Waveforms
+        The waveforms to cache.
+    compress: bool
+        If True, write a single compressed .npz file.
 
-            # and match for primary zenith
-            zenith_match = re.search(r"\s*Primary zenith angle:\s*(\d+.\d+)", line)
-
-            # check for the zenith match
-            if zenith_match:
-                props["zenith"] = float(zenith_match.group(1))
-
-            # and match for primary azimuth
-            azimuth_match = re.search(r"\s*Primary azimuth angle:\s*(-?\d+.\d+)", line)
-
-            # check for the azimuth match
-            if azimuth_match:
-                props["azimuth"] = float(azimuth_match.group(1))
+    Returns
+    -------
+    None
+    """
 
-            # and match for primary azimuth
-            lat_lon_match = re.search(
-                r"\s*\(Lat:\s*(-?\d+.\d+)\s*deg.\s*Long:\s*(-?\d+.\d+)", line
-            )
-
-            # check for the azimuth match
-            if lat_lon_match:
-                props["lat"] = float(lat_lon_match.group(1))
-                props["lon"] = float(lat_lon_match.group(2))
-
-            # and match for primary ground
-            ground_match = re.search(r"\s*Ground altitude:\s*(\d+.\d+)", line)
-
-            # check for the ground match
-            if ground_match:
-                props["ground"] = float(ground_match.group(1))
-
-            # and match for primary injection
-            injection_match = re.search(r"\s*Injection altitude:\s*(\d+.\d+)", line)
-
-            # check for the injection match
-            if injection_match:
-                props["injection"] = float(injection_match.group(1))
-
-            # and extract the magnetic intensity
-            intensity_match = re.search(r"Intensity:\s*(\d+.\d+) uT", line)
-
-            # check for an intensity match
-            if intensity_match:
-                props["mag_str"] = float(intensity_match.group(1))
-
-            # and extract the magnetic mag_inc
-            mag_inc_match = re.search(r"\s*I:\s*(-?\d+.\d+) deg", line)
-
-            # check for an mag_inc match
-            if mag_inc_match:
-                props["mag_inc"] = float(mag_inc_match.group(1))
-
-            # and extract the magnetic mag_dec
-            mag_dec_match = re.search(r"D:\s*(-?\d+.\d+) deg", line)
-
-            # check for an mag_dec match
-            if mag_dec_match:
-                props["mag_dec"] = float(mag_dec_match.group(1))
-
-            # and extract the time bin size
-            dt_match = re.search(r"\s*Time bin size:\s*(-?\d+.\d+)ns", line)
-
-            # and check for a time_bin_size match
-            if dt_match:
-                props["dt"] = float(dt_match.group(1))
-
-            # and extract the index of refraction at sea level
-            rindex_match = re.search(
-                r"\s*Refraction index at sea level:(-?\d+.\d+)", line
-            )
-
-            # and check for a refractive index match
-            if rindex_match:
-                props["rindex"] = float(rindex_match.group(1))
-
-            # and extract the thinning
-            thinning_match = re.search(r"\s*Thinning energy:\s*(\d+.\d+E-?\d+)", line)
-
-            # and check for a thinning match
-            if thinning_match:
-                props["thinning"] = float(thinning_match.group(1))
-
-            # and extract the Xmax
-            xmax_match = re.search(r"\s*Sl. depth of max. \(g/cm2\):\s*(\d+.\d+)", line)
-
-            # and check for an xmax match
-            if xmax_match:
-                props["xmax"] = float(xmax_match.group(1))
-
-            # extract antenna positions
-            if antenna_start and not (antenna_end):
-                values = line.split()
-                if len(values) != 0:
-                    if values[0].isdigit():
-                        antenna_positions.append(
-                            [
-                                int(values[0]),
-                                float(values[1]),
-                                float(values[2]),
-                                float(values[3]),
-                                float(values[4]),
-                            ]
-                        )
-            if "Antenna|   X [m]   |   Y [m]   |   Z [m]   |  t0 [ns]" in line:
-                antenna_start = True
-            elif "Time bin size:" in line:
-                antenna_end = True
-    antenna_positions = np.array(antenna_positions)
-    props["antenna_positions"] = antenna_positions
-
-    # and return the properties dict
-    return props
-
-
-def __pad_or_cut(arr: np.ndarray, length: np.ndarray) -> np.ndarray:
+    # the arrays that we cache
+    arrays = {field: getattr(waveforms, field) for field in _WAVEFORM_FIELDS}
+
+    # the compressed cache is a single file
+    if compress:
+        np.savez_compressed(os.path.join(simdir, "waveforms.npz"), **arrays)
+        return
+
+    # otherwise, write one .npy file per field so that they can be memory-mapped
+    os.makedirs(os.path.join(simdir, "waveforms"), exist_ok=True)
+    for field, array in arrays.items():
+        # write to a (unique) temporary file so we never leave a partial
+        # cache - even if several processes cache this simulation at once
+        filename = os.path.join(simdir, "waveforms", f"{field}.npy")
+        fd, tmpfile = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(filename))
+
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, array)
+            os.replace(tmpfile, filename)
+        except BaseException:
+            os.remove(tmpfile)
+            raise
+
+
+def _read_table(
+    filename: str,
+    usecols: Optional[Sequence[int]] = None,
+    dtype: type = np.float64,
+) -> np.ndarray:
     """
-    Given an array `arr` and a desired length `length`, either
-    pad the array with zeros or cut it so that `arr` has the
-    right length.
+    Read a whitespace-delimited text file of numbers into a 2D array.
+
+    This uses `np.loadtxt` unless numpy is older than 1.23 (where
+    `np.loadtxt` is pure Python) and pandas is installed, in which
+    case pandas' (much faster) C parser is used.
 
     Parameters
     ----------
-    arr: np.ndarray
-        The input array.
-    length: int
-        The desired length of the array.
+    filename: str
+        The path to the text file.
+    usecols: Sequence[int], optional
+        If given, only return these columns (in this order).
+    dtype: type
+        The floating point type that the numbers are parsed into.
 
     Returns
     -------
-    cut: np.ndarray
-        The array `arr` cut/padded to be of length `length`.
+    table: np.ndarray
+        The (rows, columns) contents of the file.
     """
-    if arr.size < length:
-        return np.pad(arr, (0, length - arr.size), mode="constant")
-    else:
-        return arr[0:length]
+    # both pandas and numpy skip the unused columns while parsing
+    # and parse directly into `dtype` (without a float64 intermediate)
+    if pd is not None:
+        table = pd.read_csv(
+            filename,
+            sep=r"\s+",
+            header=None,
+            comment="#",
+            usecols=usecols,
+            dtype=dtype,
+            engine="c",
+        )
+
+        # pandas returns the columns in file order (not in `usecols` order)
+        if usecols is not None:
+            table = table[list(usecols)]
+
+        return table.to_numpy(dtype=dtype)
+
+    return np.loadtxt(filename, usecols=usecols, dtype=dtype, ndmin=2)
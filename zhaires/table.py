@@ -1,9 +1,11 @@
 """
 Generate and load Aires data tables.
 """
+
 import os.path as op
 import re
 import subprocess
+from typing import Optional
 
 import numpy as np
 
@@ -14,8 +16,21 @@ from .utils import find_aires
 
 __all__ = ["load_table", "generate_table"]
 
+# the phrases in a table header that identify its type (in order of priority)
+_TABLE_TYPES = {
+    b"TABLE 5": "ground",
+    b"Longitudinal development: Energy": "energy",
+    b"Longitudinal development:": "long",
+    b"Lateral distribution:": "lateral",
+    b"Unweighted lateral distribution:": "lateral",
+    b"Energy distribution": "energy",
+}
+
+# a single regex that matches any of these phrases
+_TABLE_RE = re.compile(b"|".join(re.escape(phrase) for phrase in _TABLE_TYPES))
 
-def load_table(sim: str, table: int, directory: str = get_run_directory()) -> DataArray:
+
+def load_table(sim: str, table: int, directory: Optional[str] = None) -> DataArray:
     """
     Generate the table with ID `table` for the simulation `sim`
     stored in the given `directory` and load it.
@@ -26,8 +41,9 @@ def load_table(sim: str, table: int, directory: str = get_run_directory()) -> Da
         The name of the simulation to generate.
     table: int
         The ID of the table to generate.
-    directory: str
+    directory: str, optional
         The directory where simulation is stored.
+        If None, use the run directory (see `get_run_directory`).
 
     Returns
     -------
@@ -40,6 +56,9 @@ def load_table(sim: str, table: int, directory: str = get_run_directory()) -> Da
         If the table was not successfully generated.
     """
 
+    # the directory of the simulation
+    directory = directory if directory else get_run_directory()
+
     # construct the filename of the table
     filename = op.abspath(op.join(directory, sim, f"{sim}.t{table}"))
 
@@ -78,9 +97,7 @@ def load_table(sim: str, table: int, directory: str = get_run_directory()) -> Da
     return data
 
 
-def generate_table(
-    sim: str, table: int, directory: str = get_run_directory()
-) -> DataArray:
+def generate_table(sim: str, table: int, directory: Optional[str] = None) -> DataArray:
     """
     Generate the table with ID `table` for the simulation `sim`
     stored in the given `directory` and load it.
@@ -91,8 +108,9 @@ def generate_table(
         The name of the simulation to generate.
     table: int
         The ID of the table to generate.
-    directory: str
+    directory: str, optional
         The directory where simulation is stored.
+        If None, use the run directory (see `get_run_directory`).
 
     Returns
     -------
@@ -105,6 +123,9 @@ def generate_table(
         If the table was not successfully generated.
     """
 
+    # the directory of the simulation
+    directory = directory if directory else get_run_directory()
+
     # find the AiresExport command
     exportcmd = find_aires(suffix="export")
 
@@ -133,28 +154,19 @@ def parse_table_type(filename: str) -> str:
         The type of this table.
     """
 
-    # open the filename
-    with open(filename, "r") as f:
-        contents = f.read()[0:600]  # read the whole file and take 600
-
-        # now match the contents of the line against regex
-
-        if re.search(r"TABLE 5", contents):
-            return "ground"
-        if re.search(r"Longitudinal development: Energy", contents):
-            return "energy"
-        elif re.search(r"Longitudinal development:", contents):
-            return "long"
-        elif re.search(r"Lateral distribution:", contents):
-            return "lateral"
-        elif re.search(r"Unweighted lateral distribution:", contents):
-            return "lateral"
-        elif re.search(r"Energy distribution", contents):
-            return "energy"
-        elif re.search(r"Energy distribution", contents):
-            return "energy"
-        else:
-            raise ValueError("Unknown table type.")
+    # open the filename and read the header
+    with open(filename, "rb") as f:
+        contents = f.read(600)
+
+    # find all the identifying phrases in the header in a single pass
+    found = {match.group() for match in _TABLE_RE.finditer(contents)}
+
+    # and return the type of the highest priority phrase that we found
+    for phrase, table_type in _TABLE_TYPES.items():
+        if phrase in found:
+            return table_type
+
+    raise ValueError("Unknown table type.")
 
 
 def parse_lateral(data: np.ndarray) -> DataArray:
@@ -2,14 +2,18 @@
 Various utilities for working with AIRES/ZHAireS.
 """
 
-import os.path as op
+from functools import lru_cache
 from shutil import which
 
 
+@lru_cache(maxsize=None)
 def find_aires(suffix: str = "") -> str:
     """
     Try and find the Aires executable.
 
+    Successful lookups are cached so the PATH is only searched
+    once for each `suffix`.
+
     If `suffix` is defined, try and find aires+`suffix` (note
     the use of lowercase aires when suffix is defined)
 
@@ -38,8 +42,8 @@ def find_aires(suffix: str = "") -> str:
     else:
         executable = which("Aires")
 
-    # check that the executable exists
-    if executable is None or not op.exists(executable):
+    # `which` only returns existing executables
+    if executable is None:
         raise RuntimeError(
             f"Unable to find `aires{suffix}` executable. "
             "Ensure AIRES_DIR/bin is on your PATH or "
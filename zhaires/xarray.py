@@ -1,8 +1,14 @@
 """
 Load waveforms into XArray DataArray's and Datasets.
 """
+
+import atexit
+import os
 import os.path as op
-from typing import Optional, Any, Tuple
+import tempfile
+import threading
+import warnings
+from typing import Any, Dict, List, Optional, Tuple
 
 import numpy as np
 
@@ -10,8 +16,87 @@ import xarray as xr
 import zhaires.loader as loader
 from xarray import Dataset
 
+from . import _kernels
 from .path import get_run_directory
 
+# h5netcdf (and h5py) are optional but open (and read) NetCDF4 files faster
+try:
+    import h5netcdf  # noqa: F401
+    import h5py  # noqa: F401
+
+    _ENGINE: Optional[str] = "h5netcdf"
+except ImportError:
+    _ENGINE = None
+
+# the caches that are being written in the background
+_PENDING_WRITES: List[threading.Thread] = []
+
+# the (cachefile, exception) of every background write that failed
+_FAILED_WRITES: List[Tuple[str, Exception]] = []
+
+
+def _wait_for_writes() -> None:
+    """
+    Wait for every cache that is being written in the background.
+
+    This is run when the interpreter exits so no cache is left unwritten.
+
+    Raises
+    ------
+    RuntimeError
+        If any of the caches could not be written.
+
+    Returns
+    -------
+    None
+    """
+    while _PENDING_WRITES:
+        _PENDING_WRITES.pop().join()
+
+    # re-raise the first failure (the others are only warned about)
+    if _FAILED_WRITES:
+        cachefile, exc = _FAILED_WRITES.pop(0)
+        _warn_failed_writes()
+        raise RuntimeError(f"Unable to write the NetCDF cache `{cachefile}`.") from exc
+
+
+def _warn_failed_writes() -> None:
+    """
+    Warn about (and forget) every background write that has failed.
+
+    Returns
+    -------
+    None
+    """
+    while _FAILED_WRITES:
+        cachefile, exc = _FAILED_WRITES.pop(0)
+        warnings.warn(
+            f"Unable to write the NetCDF cache `{cachefile}`: {exc!r}", RuntimeWarning
+        )
+
+
+atexit.register(_wait_for_writes)
+
+
+def _waveform_array(sim: Dataset) -> np.ndarray:
+    """
+    Get the waveforms of a dataset as a C-contiguous (nant, pol, time) array.
+
+    This is a view of the waveforms unless they have to be copied
+    (i.e. if they are transposed or lazily loaded).
+
+    Parameters
+    ----------
+    sim: XArray Dataset
+        The Dataset containing ZHAires waveforms.
+
+    Returns
+    -------
+    waveforms: np.ndarray
+        The (nant, pol, time) waveforms.
+    """
+    return np.ascontiguousarray(sim.waveforms.transpose("nant", "pol", "time").values)
+
 
 def trim_dataset(sim: Dataset, trim: Tuple[float, float]) -> Dataset:
     """
@@ -39,22 +124,43 @@ def trim_dataset(sim: Dataset, trim: Tuple[float, float]) -> Dataset:
 
     """
 
-    # find the location of the peak in each simulation
-    ipeak = sim.waveforms.max(dim="pol").argmax(dim="time")
+    # the sampling period
+    dt = sim.waveforms.attrs["dt"]
+
+    # the waveforms - contiguous so the kernels can stream over each antenna
+    arr = _waveform_array(sim)
 
-    # construct the minimum and maximum indices
-    imin = ipeak - int(round(trim[0] / sim.waveforms.attrs["dt"]))
-    imax = ipeak + int(round(trim[1] / sim.waveforms.attrs["dt"]))
+    # find the location of the peak (in the absolute value) of each antenna
+    ipeak = _kernels.find_peaks(arr)
 
-    # and make sure they are clipped to the right range
-    imin = imin.clip(0, sim.time.size)
-    imax = imax.clip(0, sim.time.size)
+    # the first sample of the window of each antenna (this may be negative)
+    starts = ipeak - int(round(trim[0] / dt))
 
     # the total number of samples we are extracting
-    N = int(round((trim[1] - trim[0]) / sim.waveforms.attrs["dt"]))
+    N = int(round((trim[0] + trim[1]) / dt))
+
+    # copy the window of each antenna - the kernel zero-pads the windows
+    data = np.empty((*arr.shape[:2], N), dtype=arr.dtype)
+    _kernels.trim_waveforms(arr, starts, data)
+
+    # create the trimmed waveforms
+    waveforms = xr.DataArray(
+        data,
+        dims=["nant", "pol", "time"],
+        coords={
+            "pol": sim.pol.values,
+            "time": np.linspace(0.0, (N - 1) * dt, N, dtype=np.float32),
+        },
+        attrs=sim.waveforms.attrs,
+    )
+    waveforms.time.attrs["units"] = "ns"
 
-    # create a zeroed out array of the right size
-    new = sim.isel(time=slice(0, N))
+    # the start time of each antenna is now the start of its window
+    locations = sim.locations.copy(deep=True)
+    locations.loc[{"axis": "t0"}] += starts * dt
+
+    # and replace the waveforms and locations
+    return sim.drop_dims("time").assign(waveforms=waveforms, locations=locations)
 
 
 def resample_waveforms(sim: Dataset, fs: float, method: str = "cubic") -> Dataset:
@@ -65,6 +171,15 @@ def resample_waveforms(sim: Dataset, fs: float, method: str = "cubic") -> Datase
     This uses interpolation so may have poor accuracy if the new
     sampling rate is vastly different from the input sampling rate.
 
+    The "cubic" method uses a (compiled, if numba is installed)
+    Catmull-Rom spline. The other methods use `xarray.Dataset.interp`.
+    If one sample rate is an integer multiple of the other, the "cubic"
+    method instead uses a polyphase FIR filter (`scipy.signal.resample_poly`)
+    which also removes aliasing when downsampling.
+
+    The resampled waveforms cover the same time range as the
+    original waveforms.
+
     Parameters
     ----------
     sim: XArray Dataset
@@ -81,27 +196,92 @@ def resample_waveforms(sim: Dataset, fs: float, method: str = "cubic") -> Datase
         The waveforms resampled to `fs` GSa/s.
     """
 
-    # get the current sampling rate
-    curr_fs = 1.0 / sim.waveforms.attrs["dt"]
+    # get the current sampling period
+    dt = sim.waveforms.attrs["dt"]
 
     # if the sample rate is the same as the requested sample rate,
     # then we just return
-    if np.abs(curr_fs - fs) < 1e-9:
+    if np.abs(1.0 / dt - fs) < 1e-9:
         return sim
 
+    # the number of samples that cover the same time range
+    # (allowing for rounding error when the ratio is an integer)
+    N = int(np.floor((sim.time.size - 1) * dt * fs + 1e-9)) + 1
+
     # otherwise, construct the times that we interpolate onto
-    new_times = np.arange(0, sim.time.size) * (1.0 / fs)
+    t0 = sim.time.values[0]
+    new_times = np.linspace(t0, t0 + (N - 1) / fs, N, dtype=np.float32)
+
+    # everything but the cubic spline is done by xarray
+    if method != "cubic":
+        new = sim.interp(time=new_times, method=method)  # type: ignore
+        new.waveforms.attrs["dt"] = 1.0 / fs
+        return new
+
+    # the waveforms that we resample
+    arr = _waveform_array(sim)
+
+    # the ratio of the new and current sample rates
+    ratio = dt * fs
+
+    # integer ratios are just (filtered) up or downsampling
+    if ratio > 1 and np.abs(ratio - np.round(ratio)) < 1e-6:
+        data = _resample_poly(arr, int(np.round(ratio)), 1, N)
+    elif ratio < 1 and np.abs(1 / ratio - np.round(1 / ratio)) < 1e-6:
+        data = _resample_poly(arr, 1, int(np.round(1 / ratio)), N)
+
+    # otherwise, resample with the cubic spline
+    else:
+        data = np.empty((*arr.shape[:2], N), dtype=arr.dtype)
+        _kernels.resample_cubic(arr, 1.0 / ratio, data)
+
+    # create the resampled waveforms
+    waveforms = xr.DataArray(
+        data,
+        dims=["nant", "pol", "time"],
+        coords={"pol": sim.pol.values, "time": new_times},
+        attrs={**sim.waveforms.attrs, "dt": 1.0 / fs},
+    )
+    waveforms.time.attrs["units"] = "ns"
 
-    # and perform the interpolation
-    return sim.interp(time=new_times)
+    # and replace the waveforms
+    return sim.drop_dims("time").assign(waveforms=waveforms)
+
+
+def _resample_poly(arr: np.ndarray, up: int, down: int, N: int) -> np.ndarray:
+    """
+    Resample the waveforms by an integer factor with a polyphase FIR filter.
+
+    Parameters
+    ----------
+    arr: np.ndarray
+        The (nant, pol, time) waveforms.
+    up: int
+        The upsampling factor.
+    down: int
+        The downsampling factor.
+    N: int
+        The number of samples to keep.
+
+    Returns
+    -------
+    resampled: np.ndarray
+        The (nant, pol, N) resampled waveforms.
+    """
+
+    # scipy.signal is slow to import so it is only imported when it's used
+    from scipy.signal import resample_poly
+
+    return resample_poly(arr, up, down, axis=-1)[..., :N].astype(arr.dtype)
 
 
 def load_waveforms(
     sim: str,
-    directory: str = get_run_directory(),
+    directory: Optional[str] = None,
     write_netcdf: bool = True,
     resample: Optional[float] = None,
     trim: Optional[Tuple[float, float]] = None,
+    lazy: bool = False,
     **kwargs: Any,
 ) -> Dataset:
     """
@@ -110,24 +290,34 @@ def load_waveforms(
 
     This assumes that there is only one shower per simulation file.
 
-    if `write_cache` is True, the extracted waveforms are saved
-    as a .nc file in the simulation directory. Whenever this simulation
+    if `write_netcdf` is True, the extracted waveforms are saved (in
+    the background) as a .nc file in the simulation directory. Whenever this simulation
     is loaded, the .nc file will be loaded directly instead of reloading
     and reparsing the giant text file. This is orders of magnitude faster
-    when loading large simulations.
+    when loading large simulations. The cache contains the raw waveforms
+    (before any `resample` or `trim`) so it can be reused with any of them.
+    If the cache can't be written, a RuntimeWarning is issued by the next
+    call to `load_waveforms`.
+
+    If `lazy` is True (this requires dask), a cached simulation is opened
+    as chunked dask arrays so that only the antennas (and times) that
+    are used are read from disk. Otherwise, the cache is read into memory.
 
     Parameters
     ----------
     sim: str
         The Aires task name for the simulation.
-    directory: str
+    directory: str, optional
         The directory to search for the simulation.
+        If None, use the run directory (see `get_run_directory`).
     write_netcdf: str
         If True, write a NetCDF file to speed up loading future data accesses.
     resample: float, optional
         If not None, resample the waveforms to this sample rate in GSa/s.
     trim: (float, float), optional
         If not None, trim the waveform to (before, after) ns after the peak in the absolute value.
+    lazy: bool
+        If True, lazily load a cached simulation with dask.
     **kwargs:
         Any additional arguments are passed to 'resample_waveforms'
 
@@ -137,48 +327,90 @@ def load_waveforms(
         A multi-dimensional data array containing the loaded waveforms.
     """
 
-    # the path to the cache file
-    cachefile = op.join(directory, *(sim, f"{sim}.nc"))
+    # report any earlier caches that failed to write
+    _warn_failed_writes()
+
+    # the directory of the simulation
+    directory = directory if directory else get_run_directory()
+    simdir = op.join(directory, sim)
+
+    # the path to the cache file - this only contains the raw waveforms so
+    # that it can be reused with any `trim` or `resample`
+    cachefile = op.join(simdir, f"{sim}.raw.nc")
+
+    # the raw dataset if it has to be written to the cache
+    uncached: Optional[Dataset] = None
 
     # if the cache file exists, load it.
     if op.exists(cachefile):
-        return xr.open_dataset(cachefile)
+        dataset = _open_cache(cachefile, lazy)
 
-    # load the waveforms into a a structured NumPy array
-    raw = loader.load_waveforms(sim, directory, write_cache=False)
+    # otherwise, parse the simulation (and write the cache if we want to)
+    else:
+        dataset = _create_dataset(sim, directory)
+        if write_netcdf:
+            uncached = dataset
 
-    # load the properties dict for this simulation
-    props = loader.load_properties(sim, directory)
+    # check if we want to resample
+    if resample is not None:
+        dataset = resample_waveforms(dataset, resample, **kwargs)
 
-    # the number of antennas
-    nant = raw.shape[0]
+    # check if we want to trim the waveforms
+    if trim:
+        dataset = trim_dataset(dataset, trim)
+
+    # start writing the cache - the raw waveforms only have to be copied
+    # if they are also returned (i.e. they weren't resampled or trimmed)
+    if uncached is not None:
+        shared = np.shares_memory(uncached.waveforms.values, dataset.waveforms.values)
+        _write_cache_async(uncached, cachefile, copy=shared)
+
+    # and return the dataset
+    return dataset
+
+
+def _create_dataset(sim: str, directory: str) -> Dataset:
+    """
+    Load the raw ZHAireS antenna signals (and properties) into a Dataset.
+
+    Parameters
+    ----------
+    sim: str
+        The Aires task name for the simulation.
+    directory: str
+        The directory to search for the simulation.
+
+    Returns
+    -------
+    dataset: Dataset
+        The waveforms, locations (and angles) of every antenna.
+    """
+
+    # load the waveforms into NumPy arrays
+    raw = loader.load_waveforms(sim, directory, write_cache=False)
 
-    # number of polarizations
-    npol = 3
+    # the properties dict for this simulation
+    props = raw.properties
 
-    # and the length of each waveform
-    length = raw["Ex"].shape[-1]
+    # the number of antennas and the length of each waveform
+    nant, length = raw.Ex.shape
 
     # compute the sampling period
-    dt = raw["t"][0, 1] - raw["t"][0, 0]
+    dt = raw.t[0, 1] - raw.t[0, 0]
 
-    # allocate the memory for the XArray
-    data = np.zeros((nant, npol, length))
+    # the sample times (relative to the start of each waveform)
+    times = np.linspace(0.0, (length - 1) * dt, length, dtype=np.float32)
 
-    # fill in the data
-    data[..., 0, :] = raw["Ex"]
-    data[..., 1, :] = raw["Ey"]
-    data[..., 2, :] = raw["Ez"]
+    # the (nant, pol, time) fields are used without a copy unless they were
+    # (read-only) memory-mapped from the loader's cache
+    E = raw.E if raw.E.flags.writeable else np.array(raw.E)
 
     # create the data array
+    # (the antennas are only indexed by position so `nant` has no coordinate)
     waveforms = xr.DataArray(
-        data,
+        E,
         dims=["nant", "pol", "time"],
-        coords={
-            "nant": np.arange(nant),
-            "pol": ["Ex", "Ey", "Ez"],
-            "time": np.arange(length) * dt,
-        },
+        coords={"pol": ["Ex", "Ey", "Ez"], "time": times},
     )
 
     # set the units (and sampling period) for the waveforms
@@ -187,68 +419,193 @@ def load_waveforms(
     waveforms.time.attrs["units"] = "ns"
 
     # the antenna locations
-    antennas = np.zeros((nant, 4))
-    antennas[:, 0] = raw["x"]
-    antennas[:, 1] = raw["y"]
-    antennas[:, 2] = raw["z"]
-    antennas[:, 3] = raw["t"][:, 0]  # the start time for each waveform
+    antennas = np.empty((nant, 4), dtype=np.float32)
+    antennas[:, :3] = raw.positions
+    antennas[:, 3] = raw.t[:, 0]  # the start time for each waveform
 
     # construct the data array for the locations
     locations = xr.DataArray(
         antennas,
         dims=["nant", "axis"],
-        coords={"nant": np.arange(nant), "axis": ["x", "y", "z", "t0"]},
+        coords={"axis": ["x", "y", "z", "t0"]},
     )
 
     # set the unit for the locations
     locations.attrs["units"] = "m | ns"
 
+    # the variables in the dataset
+    data_vars = {"waveforms": waveforms, "locations": locations}
+
     # the filename for the antenna files (if they exist)
-    antfile = op.join(directory, *(sim, "antenna_angles.dat"))
+    antfile = op.join(directory, sim, "antenna_angles.dat")
 
     # if it exists, load it
     if op.exists(antfile):
-        # load the raw data
-        raw_angles = np.loadtxt(antfile)
+        # load the angles and distance (the other columns are skipped)
+        raw_angles = loader._read_table(antfile, usecols=(3, 4, 5), dtype=np.float32)
 
         # and construct the data array
         angles = xr.DataArray(
-            raw_angles[:, (3, 4, 5)],
+            raw_angles,
             dims=["nant", "coord"],
-            coords={"nant": np.arange(nant), "coord": ["theta", "phi", "D"]},
+            coords={"coord": ["theta", "phi", "D"]},
         )
 
         # and set the units for the angle array
         angles.attrs["units"] = "deg | m"
 
-        # and add it to the data array
-        dataset = Dataset(
-            {"waveforms": waveforms, "locations": locations, "angles": angles}
+        # and add it to the dataset
+        data_vars["angles"] = angles
+
+    # construct the dataset (with the angles if we have them)
+    dataset = Dataset(data_vars)
+
+    # and save the simulation name, directory, and properties - the antenna
+    # positions are already in `locations` (and NetCDF can't store 2D attributes)
+    dataset.attrs.update(
+        {
+            "name": sim,
+            "directory": directory,
+            **{k: v for k, v in props.items() if k != "antenna_positions"},
+        }
+    )
+
+    return dataset
+
+
+def _open_cache(cachefile: str, lazy: bool = False) -> Dataset:
+    """
+    Open a cached dataset.
+
+    Parameters
+    ----------
+    cachefile: str
+        The path to the NetCDF cache.
+    lazy: bool
+        If True, lazily load the dataset with dask.
+
+    Returns
+    -------
+    dataset: Dataset
+        The cached dataset.
+    """
+
+    # only read the chunks that are used
+    if lazy:
+        return xr.open_dataset(
+            cachefile, engine=_ENGINE, chunks={"nant": 64, "time": 4096}
         )
 
-    else:  # we don't have an antenna angle file
-        # construct the dataset without the angles
-        dataset = Dataset({"waveforms": waveforms, "locations": locations})
+    # otherwise, read it all into memory (and close the file)
+    with xr.open_dataset(cachefile, engine=_ENGINE) as dataset:
+        return dataset.load()
 
-    # and save the simulation name and directory
-    dataset.attrs["name"] = sim
-    dataset.attrs["directory"] = directory
 
-    # and save the properties into the array
-    for k, v in props.items():
-        dataset.attrs[k] = v
+def _write_cache_async(dataset: Dataset, cachefile: str, copy: bool = True) -> None:
+    """
+    Write a dataset to a NetCDF cache in a background thread.
 
-    # check if we want to resample
-    if resample is not None:
-        dataset = resample_waveforms(dataset, resample, **kwargs)
+    The dataset is copied first so that the caller is free to modify it.
+    If `copy` is False, the (large) waveforms are not copied so the caller
+    must not modify them until the cache is written.
 
-    # check if we want to trim the waveforms
-    if trim:
-        dataset = trim_dataset(dataset, trim)
+    Any error is recorded and raised by `_wait_for_writes` (or warned
+    about by the next call to `load_waveforms`).
 
-    # if we want to write the cache, then write it to disk
-    if write_netcdf:
-        dataset.to_netcdf(path=cachefile, mode="w", format="NETCDF4")
+    Parameters
+    ----------
+    dataset: Dataset
+        The dataset to cache.
+    cachefile: str
+        The path to the NetCDF cache.
+    copy: bool
+        If True, also copy the waveforms.
 
-    # and return the created dataset
-    return dataset
+    Returns
+    -------
+    None
+    """
+
+    # the locations and angles are small so they are always copied
+    cached = dataset.drop_vars("waveforms").copy(deep=True)
+    cached["waveforms"] = dataset.waveforms.copy(deep=copy)
+
+    # forget about the writes that have already finished
+    _PENDING_WRITES[:] = [thread for thread in _PENDING_WRITES if thread.is_alive()]
+
+    # and start writing this cache
+    thread = threading.Thread(
+        target=_write_cache_background, args=(cached, cachefile), daemon=True
+    )
+    thread.start()
+    _PENDING_WRITES.append(thread)
+
+
+def _write_cache_background(dataset: Dataset, cachefile: str) -> None:
+    """
+    Write a NetCDF cache and record (rather than raise) any error.
+
+    This is run in the threads started by `_write_cache_async`.
+
+    Parameters
+    ----------
+    dataset: Dataset
+        The dataset to cache.
+    cachefile: str
+        The path to the NetCDF cache.
+
+    Returns
+    -------
+    None
+    """
+    try:
+        _write_cache(dataset, cachefile)
+    except Exception as exc:
+        _FAILED_WRITES.append((cachefile, exc))
+
+
+def _write_cache(dataset: Dataset, cachefile: str) -> None:
+    """
+    Write a dataset to a (chunked and compressed) NetCDF cache.
+
+    The cache is written to a temporary file that is then renamed
+    so a partially written cache is never loaded.
+
+    Parameters
+    ----------
+    dataset: Dataset
+        The dataset to cache.
+    cachefile: str
+        The path to the NetCDF cache.
+
+    Returns
+    -------
+    None
+    """
+
+    # the shape of the waveforms
+    nant, npol, length = dataset.waveforms.shape
+
+    # chunk (and compress) the cache so that a subset of the
+    # antennas (or a time window) can be read without the rest
+    encoding: Dict[str, Dict[str, Any]] = {
+        "waveforms": {
+            "dtype": "float32",
+            "zlib": True,
+            "complevel": 1,
+            "shuffle": True,
+            "chunksizes": (min(nant, 64), npol, min(length, 4096)),
+        },
+        "locations": {"chunksizes": (min(nant, 1024), 4)},
+    }
+
+    # a temporary file in the same directory (so that it can be renamed)
+    fd, tmpfile = tempfile.mkstemp(suffix=".tmp", dir=op.dirname(cachefile))
+    os.close(fd)
+
+    try:
+        dataset.to_netcdf(path=tmpfile, mode="w", format="NETCDF4", encoding=encoding)
+        os.replace(tmpfile, cachefile)
+    except BaseException:
+        os.remove(tmpfile)
+        raise